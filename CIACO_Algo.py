@@ -1,12 +1,21 @@
+import multiprocessing
 import random
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple, Optional
+from numba import cuda
+from sklearn.cluster import KMeans
 from helper_functions import (
-    euclidean_distance, 
-    total_route_distance,
     calculate_visibility_matrix,
-    calculate_route_quality,
-    normalize_matrix
+    calculate_route_quality
+)
+from ciaco_kernels import (
+    run_iteration,
+    update_pheromones,
+    pairwise_distances,
+    run_iteration_gpu,
+    CUDA_AVAILABLE,
+    MAX_GPU_STOPS
 )
 
 # -------------------------------
@@ -28,11 +37,16 @@ class CIACO:
         return_to_depot (bool): Whether to return to the starting point
         num_clusters (int): Number of clusters for initialization
         elitist_factor (float): Factor for elitist pheromone update
+        num_colonies (int): Number of independent colonies run in parallel processes
+        exchange_interval (int): Iterations between best-route exchanges among colonies
+        use_gpu (bool): Construct routes on a CUDA device (single colony only)
     """
     def __init__(self, num_ants: int = 10, iterations: int = 50, alpha: float = 1.0, 
                  beta: float = 2.0, evaporation_rate: float = 0.1, 
                  initial_pheromone: float = 1.0, return_to_depot: bool = True,
-                 num_clusters: int = 3, elitist_factor: float = 2.0):
+                 num_clusters: int = 3, elitist_factor: float = 2.0,
+                 num_colonies: int = 1, exchange_interval: int = 10,
+                 use_gpu: bool = False):
         # Validate input parameters
         if num_ants <= 0:
             raise ValueError("Number of ants must be positive")
@@ -50,6 +64,14 @@ class CIACO:
             raise ValueError("Number of clusters must be positive")
         if elitist_factor < 1:
             raise ValueError("Elitist factor must be >= 1")
+        if num_colonies <= 0:
+            raise ValueError("Number of colonies must be positive")
+        if exchange_interval <= 0:
+            raise ValueError("Exchange interval must be positive")
+        if use_gpu and num_colonies > 1:
+            raise ValueError("GPU route construction supports a single colony only")
+        if use_gpu and not CUDA_AVAILABLE:
+            raise RuntimeError("CUDA device not available")
 
         self.num_ants = num_ants
         self.iterations = iterations
@@ -60,15 +82,23 @@ class CIACO:
         self.return_to_depot = return_to_depot
         self.num_clusters = num_clusters
         self.elitist_factor = elitist_factor
+        self.num_colonies = num_colonies
+        self.exchange_interval = exchange_interval
+        self.use_gpu = use_gpu
         
         # Initialize matrices
         self.pheromone_matrix: Optional[np.ndarray] = None
         self.distance_matrix: Optional[np.ndarray] = None
         self.visibility_matrix: Optional[np.ndarray] = None
+        self._choice_matrix: Optional[np.ndarray] = None
         self.best_route: Optional[List[Tuple[float, float]]] = None
         self.best_distance = float('inf')
         self.stops: Optional[List[Tuple[float, float]]] = None
+        self._pts: Optional[np.ndarray] = None
+        self._visibility_beta: Optional[np.ndarray] = None
+        self._best_route_idx: Optional[np.ndarray] = None
         self.clusters: Optional[List[List[int]]] = None
+        self._device_distance_matrix = None
 
     def _cluster_stops(self) -> List[List[int]]:
         """
@@ -77,70 +107,50 @@ class CIACO:
         Returns:
             List of lists containing indices of stops in each cluster
         """
-        if self.stops is None:
+        if self._pts is None:
             raise RuntimeError("Stops not initialized")
             
-        n = len(self.stops)
+        n = self._pts.shape[0]
         if n <= self.num_clusters:
             return [[i] for i in range(n)]
             
-        # Convert stops to numpy array for clustering
-        points = np.array(self.stops)
-        
-        # Initialize centroids randomly
-        centroids = points[random.sample(range(n), self.num_clusters)]
-        
-        # Perform K-means clustering
-        for _ in range(100):  # Max iterations
-            # Assign points to nearest centroid
-            clusters = [[] for _ in range(self.num_clusters)]
-            for i, point in enumerate(points):
-                distances = [euclidean_distance(point, centroid) for centroid in centroids]
-                cluster_idx = np.argmin(distances)
-                clusters[cluster_idx].append(i)
-                
-            # Update centroids
-            new_centroids = []
-            for cluster in clusters:
-                if cluster:
-                    cluster_points = points[cluster]
-                    new_centroid = np.mean(cluster_points, axis=0)
-                    new_centroids.append(new_centroid)
-                    
-            # Check convergence
-            if len(new_centroids) == len(centroids):
-                if np.allclose(centroids, new_centroids, rtol=1e-5, atol=1e-5):
-                    break
-                    
-            centroids = np.array(new_centroids)
+        # Reuse the stop array built in optimize_route; sklearn's K-means also
+        # relocates empty clusters instead of leaving them behind
+        kmeans = KMeans(n_clusters=self.num_clusters, n_init=1, max_iter=100,
+                        random_state=random.randrange(2**31))
+        labels = kmeans.fit_predict(self._pts)
             
-        return clusters
+        return [np.flatnonzero(labels == c).tolist() for c in range(self.num_clusters)]
 
     def _initialize_pheromones(self) -> None:
         """
         Initialize pheromone matrix using clustering information.
         """
-        if self.stops is None or self.clusters is None:
+        if self._pts is None or self.clusters is None:
             raise RuntimeError("Stops and clusters must be initialized")
             
-        n = len(self.stops)
-        self.pheromone_matrix = np.ones((n, n)) * self.initial_pheromone
-        np.fill_diagonal(self.pheromone_matrix, 0)
+        n = self._pts.shape[0]
+        self.pheromone_matrix = np.full((n, n), self.initial_pheromone, dtype=np.float32)
         
-        # Strengthen pheromone trails within clusters
+        # Strengthen pheromone trails within clusters; the submatrix covers both (i, j) and (j, i)
         for cluster in self.clusters:
-            for i in cluster:
-                for j in cluster:
-                    if i != j:
-                        self.pheromone_matrix[i][j] *= 1.5
-                        self.pheromone_matrix[j][i] *= 1.5
+            idx = np.asarray(cluster, dtype=np.intp)
+            if idx.size > 1:
+                self.pheromone_matrix[np.ix_(idx, idx)] *= 1.5
+        np.fill_diagonal(self.pheromone_matrix, 0)
 
-    def optimize_route(self, stops: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    def optimize_route(self, stops: List[Tuple[float, float]],
+                       distance_matrix: Optional[np.ndarray] = None,
+                       visibility_matrix: Optional[np.ndarray] = None) -> List[Tuple[float, float]]:
         """
         Optimize the route using the complete CIACO algorithm.
         
         Args:
             stops: List of coordinates (x, y) representing stops
+            distance_matrix: Optional precomputed (n, n) distances between the stops,
+                e.g. road or great-circle distances; Euclidean distances are used otherwise
+            visibility_matrix: Optional precomputed (n, n) visibility; derived from the
+                distances when omitted
             
         Returns:
             List of coordinates representing the optimized route
@@ -152,18 +162,56 @@ class CIACO:
             return stops
 
         self.stops = stops
-        n = len(stops)
+        route_idx = self.optimize_route_array(np.asarray(stops, dtype=np.float64),
+                                              distance_matrix, visibility_matrix)
 
-        # Initialize matrices
-        self.distance_matrix = np.zeros((n, n))
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    self.distance_matrix[i][j] = euclidean_distance(stops[i], stops[j])
-                    self.distance_matrix[j][i] = self.distance_matrix[i][j]
-
-        # Calculate visibility matrix
-        self.visibility_matrix = calculate_visibility_matrix(stops)
+        # Convert stop indices back to coordinates only once
+        self.best_route = [stops[i] for i in route_idx]
+        return self.best_route
+
+    def optimize_route_array(self, points: np.ndarray,
+                             distance_matrix: Optional[np.ndarray] = None,
+                             visibility_matrix: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Optimize the route of stops already held in an array, without list conversions.
+        
+        Args:
+            points: (n, 2) float64 array of stop coordinates; row 0 is the depot
+            distance_matrix: Optional precomputed (n, n) distances between the stops
+            visibility_matrix: Optional precomputed (n, n) visibility of the stops
+            
+        Returns:
+            Array of stop indices in visiting order
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[0] == 0:
+            raise ValueError("Stops array must have shape (n, 2) with n > 0")
+        
+        if points.shape[0] <= 2:
+            return np.arange(points.shape[0])
+
+        n = points.shape[0]
+        for name, matrix in (("Distance", distance_matrix), ("Visibility", visibility_matrix)):
+            if matrix is not None and np.shape(matrix) != (n, n):
+                raise ValueError(f"{name} matrix must have shape ({n}, {n})")
+
+        # Everything below works on this (n, 2) array and stop indices
+        self._pts = points
+
+        # Initialize matrices; float32 halves the memory traffic of the per-step row reads.
+        # Visibility is derived from the same distances rather than a second pass over the stops
+        if distance_matrix is None:
+            distances = pairwise_distances(np.ascontiguousarray(self._pts))
+        else:
+            distances = np.asarray(distance_matrix, dtype=np.float64)
+        self.distance_matrix = distances.astype(np.float32)
+        if visibility_matrix is None:
+            self.visibility_matrix = calculate_visibility_matrix(self._pts, distances)
+        else:
+            self.visibility_matrix = np.asarray(visibility_matrix, dtype=np.float32)
+
+        # Visibility never changes during the search, so raise it to beta once
+        self._visibility_beta = np.power(self.visibility_matrix, self.beta)
         
         # Perform clustering
         self.clusters = self._cluster_stops()
@@ -171,96 +219,172 @@ class CIACO:
         # Initialize pheromones with clustering information
         self._initialize_pheromones()
 
-        # Main ACO loop
-        for iteration in range(self.iterations):
-            # Each ant constructs a solution
-            ant_routes = []
-            ant_distances = []
-            
-            for ant in range(self.num_ants):
-                route = self._construct_solution()
-                distance = total_route_distance(route, self.return_to_depot)
-                ant_routes.append(route)
-                ant_distances.append(distance)
-                
-                # Update best solution if found
-                if distance < self.best_distance:
-                    self.best_distance = distance
-                    self.best_route = route
+        # Start a fresh search; results from a previous call refer to other stops
+        self.best_distance = float('inf')
+        self._best_route_idx = None
 
-            # Update pheromones with elitist strategy
-            self._update_pheromones(ant_routes, ant_distances)
+        # Distances stay resident on the device for the whole search
+        self._device_distance_matrix = None
+        if self.use_gpu and self._pts.shape[0] <= MAX_GPU_STOPS:
+            self._device_distance_matrix = cuda.to_device(self.distance_matrix)
 
-        return self.best_route
+        if self.num_colonies > 1:
+            self._run_colonies()
+        else:
+            self._run_iterations(self.iterations)
+
+        return self._best_route_idx
 
-    def _construct_solution(self) -> List[Tuple[float, float]]:
+    def _run_iterations(self, count: int) -> None:
         """
-        Construct a solution using the pheromone matrix and visibility information.
+        Run the main ACO loop of this colony for a number of iterations.
+        
+        Args:
+            count: Number of iterations to run
         """
-        if self.stops is None or self.pheromone_matrix is None or self.visibility_matrix is None:
-            raise RuntimeError("Algorithm not properly initialized")
+        # Every iteration overwrites the same float32 buffer instead of allocating two temporaries
+        if self._choice_matrix is None or self._choice_matrix.shape != self.pheromone_matrix.shape:
+            self._choice_matrix = np.empty_like(self.pheromone_matrix)
             
-        n = len(self.stops)
-        unvisited = list(range(1, n))  # Start from index 0 (depot)
-        current = 0
-        route = [self.stops[0]]  # Start with depot
-
-        while unvisited:
-            # Calculate probabilities for each unvisited city
-            probabilities = np.zeros(n)
-            for next_city in unvisited:
-                pheromone = self.pheromone_matrix[current][next_city] ** self.alpha
-                visibility = self.visibility_matrix[current][next_city] ** self.beta
-                probabilities[next_city] = pheromone * visibility
-
-            # Normalize probabilities
-            probabilities = normalize_matrix(probabilities)
+        for iteration in range(count):
+            # Pheromones only change between iterations; combine both factors once
+            np.power(self.pheromone_matrix, self.alpha, out=self._choice_matrix)
+            np.multiply(self._choice_matrix, self._visibility_beta, out=self._choice_matrix)
+
+            # All ants construct their solutions in parallel
+            if self._device_distance_matrix is not None:
+                ant_routes, ant_distances = run_iteration_gpu(
+                    self._choice_matrix, self._device_distance_matrix, self.num_ants,
+                    self.return_to_depot, random.randrange(2**31)
+                )
+            else:
+                ant_routes, ant_distances = run_iteration(
+                    self._choice_matrix, self.distance_matrix, self.num_ants,
+                    self.return_to_depot, random.randrange(2**31)
+                )
             
-            # Select next city using roulette wheel selection
-            next_city = random.choices(range(n), weights=probabilities, k=1)[0]
-            while next_city not in unvisited:
-                next_city = random.choices(range(n), weights=probabilities, k=1)[0]
+            # Update best solution if found
+            best_ant = int(np.argmin(ant_distances))
+            if ant_distances[best_ant] < self.best_distance:
+                self.best_distance = float(ant_distances[best_ant])
+                self._best_route_idx = ant_routes[best_ant].copy()
+
+            # Update pheromones with elitist strategy
+            self._update_pheromones(ant_routes, ant_distances)
+
+    def _run_colonies(self) -> None:
+        """
+        Run several independent colonies in parallel processes.
+        Every exchange_interval iterations each colony reinforces the best route
+        of its neighbour on a ring, and the overall best is kept on this instance.
+        """
+        colonies = [self._spawn_colony() for _ in range(self.num_colonies)]
+        remaining = self.iterations
 
-            route.append(self.stops[next_city])
-            unvisited.remove(next_city)
-            current = next_city
+        # Spawned workers: forking after the parallel Numba kernels have started their
+        # thread pool leaves the process hanging at exit
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.num_colonies, mp_context=mp_context) as executor:
+            while remaining > 0:
+                epoch = min(self.exchange_interval, remaining)
+                seeds = [random.randrange(2**31) for _ in colonies]
+                colonies = list(executor.map(_run_colony, colonies, [epoch] * len(colonies), seeds))
+                remaining -= epoch
 
-        # Return to depot if required
-        if self.return_to_depot:
-            route.append(self.stops[0])
+                # Keep the best route found by any colony
+                for colony in colonies:
+                    if colony.best_distance < self.best_distance:
+                        self.best_distance = colony.best_distance
+                        self._best_route_idx = colony._best_route_idx.copy()
+
+                # Ring exchange: colony k learns from colony k - 1
+                if remaining > 0:
+                    bests = [(c._best_route_idx, c.best_distance) for c in colonies]
+                    for k, colony in enumerate(colonies):
+                        route, distance = bests[k - 1]
+                        colony._reinforce_route(route, distance)
+
+        self.pheromone_matrix = min(colonies, key=lambda c: c.best_distance).pheromone_matrix
+
+    def _spawn_colony(self) -> 'CIACO':
+        """
+        Create a single-colony copy of this optimizer sharing the initialized matrices.
+        
+        Returns:
+            CIACO instance ready to run _run_iterations
+        """
+        colony = CIACO.__new__(CIACO)
+        colony.__dict__.update(self.__dict__)
+        colony.num_colonies = 1
+        colony.pheromone_matrix = self.pheromone_matrix.copy()
+        return colony
 
-        return route
+    def _reinforce_route(self, route: np.ndarray, distance: float) -> None:
+        """
+        Deposit elitist pheromone on a route received from another colony.
+        
+        Args:
+            route: Stop indices of the route
+            distance: Total distance of the route
+        """
+        contribution = self.elitist_factor / (distance + 1e-10)  # Add small epsilon
+        amounts = np.full(2 * (route.shape[0] - 1), contribution, dtype=self.pheromone_matrix.dtype)
+        update_pheromones(
+            self.pheromone_matrix,
+            np.concatenate((route[:-1], route[1:])),
+            np.concatenate((route[1:], route[:-1])),
+            amounts,
+            0.0
+        )
 
-    def _update_pheromones(self, ant_routes: List[List[Tuple[float, float]]], 
-                          ant_distances: List[float]) -> None:
+    def _update_pheromones(self, ant_routes: np.ndarray, ant_distances: np.ndarray) -> None:
         """
         Update pheromone trails using elitist strategy.
+        
+        Args:
+            ant_routes: (num_ants, route_length) array of stop indices
+            ant_distances: Total distance of each ant's route
         """
-        if self.stops is None or self.pheromone_matrix is None:
+        if self._pts is None or self.pheromone_matrix is None:
             raise RuntimeError("Algorithm not properly initialized")
 
-        # Evaporate pheromones
-        self.pheromone_matrix *= (1 - self.evaporation_rate)
-
         # Find best ant in this iteration
         best_ant_idx = np.argmin(ant_distances)
         best_route = ant_routes[best_ant_idx]
         best_distance = ant_distances[best_ant_idx]
 
-        # Update pheromones based on all ants
-        for route, distance in zip(ant_routes, ant_distances):
-            # Avoid division by zero
-            contribution = 1.0 / (distance + 1e-10)  # Add small epsilon to avoid division by zero
-            for i in range(len(route) - 1):
-                current = self.stops.index(route[i])
-                next_stop = self.stops.index(route[i + 1])
-                self.pheromone_matrix[current][next_stop] += contribution
-                self.pheromone_matrix[next_stop][current] += contribution
-
-        # Apply elitist update to best route
+        # Deposits of all ants, each edge in both directions
+        rows = ant_routes[:, :-1].ravel()
+        cols = ant_routes[:, 1:].ravel()
+        contributions = np.repeat(1.0 / (ant_distances + 1e-10),  # Add small epsilon to avoid division by zero
+                                  ant_routes.shape[1] - 1)
+
+        # Elitist deposit on the best route of this iteration
         elitist_contribution = self.elitist_factor / (best_distance + 1e-10)  # Add small epsilon
-        for i in range(len(best_route) - 1):
-            current = self.stops.index(best_route[i])
-            next_stop = self.stops.index(best_route[i + 1])
-            self.pheromone_matrix[current][next_stop] += elitist_contribution
-            self.pheromone_matrix[next_stop][current] += elitist_contribution
\ No newline at end of file
+        best_from, best_to = best_route[:-1], best_route[1:]
+        elitist = np.full(best_from.shape[0], elitist_contribution)
+
+        # Evaporate and deposit everything in one tiled pass over the matrix
+        update_pheromones(
+            self.pheromone_matrix,
+            np.concatenate((rows, cols, best_from, best_to)),
+            np.concatenate((cols, rows, best_to, best_from)),
+            np.concatenate((contributions, contributions, elitist, elitist)).astype(self.pheromone_matrix.dtype),
+            self.evaporation_rate
+        )
+
+def _run_colony(colony: CIACO, iterations: int, seed: int) -> CIACO:
+    """
+    Worker entry point: run one colony for a number of iterations.
+    
+    Args:
+        colony: Colony to advance
+        iterations: Number of iterations to run
+        seed: Seed for the worker's random module
+        
+    Returns:
+        The advanced colony, sent back to the parent process
+    """
+    random.seed(seed)
+    colony._run_iterations(iterations)
+    return colony
@@ -1,6 +1,9 @@
 from typing import Tuple
 
 class Order:
+    # Demos create many orders; slots keep each one free of a per-instance dict
+    __slots__ = ('order_id', 'weight', 'pickup', 'dropoff')
+
     def __init__(self, order_id: str, weight: float, pickup: Tuple[float, float],
                  dropoff: Tuple[float, float]):
         """
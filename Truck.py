@@ -1,4 +1,5 @@
 from typing import List, Tuple
+import numpy as np
 from Order import Order
 
 class Truck:
@@ -17,13 +18,28 @@ class Truck:
         self.assigned_orders: List[Order] = []
         # For simplicity, maintain a route as a list of stops (each stop is a tuple (x, y))
         # Initial route starts at the truck's current location (assume depot is its starting point)
-        self.route: List[Tuple[float, float]] = [current_location]
+        self.route = [current_location]
         # Track remaining capacity
         self.remaining_capacity = max_capacity
 
-    def update_capacity(self):
+    @property
+    def route(self) -> List[Tuple[float, float]]:
         """
-        Update remaining capacity based on the assigned orders.
+        The route as a list of stops. Assign a new list to change it; the
+        contiguous (n, 2) copy in route_arr is only refreshed on assignment.
+        """
+        return self._route
+
+    @route.setter
+    def route(self, stops: List[Tuple[float, float]]):
+        self._route = list(stops)
+        # Distance computations read this array instead of walking the tuples
+        self.route_arr = np.asarray(self._route, dtype=np.float64).reshape(-1, 2)
+
+    def recompute_capacity(self):
+        """
+        Recompute remaining capacity from the assigned orders.
+        Only needed after assigned_orders has been modified directly.
         """
         used_capacity = sum(order.weight for order in self.assigned_orders)
         self.remaining_capacity = self.max_capacity - used_capacity
@@ -33,7 +49,7 @@ class Truck:
         Add a new order to the truck and update route and capacity.
         """
         self.assigned_orders.append(order)
-        self.update_capacity()
+        self.remaining_capacity -= order.weight
 
     def __repr__(self):
         return f"Truck({self.truck_id}, remaining_capacity={self.remaining_capacity}kg)"
\ No newline at end of file
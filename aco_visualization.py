@@ -1,16 +1,152 @@
+import contextlib
+import heapq
+import multiprocessing
+import os
 import folium
+from folium.plugins import FastMarkerCluster
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
+from matplotlib.colors import to_hex
 import random
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple, Dict
 import osmnx as ox
 import networkx as nx
+from numba import njit
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+from pyproj import Transformer
+from shapely.geometry import LineString
 from CIACO_Algo import CIACO
+from data_io import read_csv
 from Truck import Truck
 from Order import Order
 
+# Annotated street networks are saved here and reused across runs;
+# OSMnx keeps its raw Overpass responses in the same folder
+GRAPH_CACHE_DIR = "cache"
+ox.settings.use_cache = True
+ox.settings.cache_folder = GRAPH_CACHE_DIR
+
+def _optimize_truck_route(ciaco, stops_xy, seed, distance_matrix=None):
+    """
+    Worker entry point: optimize one truck's route
+    
+    Args:
+        ciaco: CIACO optimizer (a private copy in a worker process)
+        stops_xy: (n, 2) array of the truck's stops
+        seed: Seed for the random module, so trucks do not share a random stream
+        distance_matrix: Optional (n, n) road distances between the stops
+        
+    Returns:
+        Array of stop indices in visiting order
+    """
+    random.seed(seed)
+    return ciaco.optimize_route_array(stops_xy, distance_matrix=distance_matrix)
+
+# Leaflet marker for a [y, x, color, icon, popup] row of a FastMarkerCluster
+STOP_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({markerColor: row[2], icon: row[3], prefix: 'fa'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[4]);
+    return marker;
+}
+"""
+
+# Operation codes of the capacity timeline simulation
+OP_START, OP_PICKUP, OP_DROPOFF = 0, 1, 2
+OPERATION_LABELS = {OP_PICKUP: "Pickup", OP_DROPOFF: "Dropoff"}
+
+def _coordinate_column(points, axis):
+    """
+    Extract one coordinate of a list of (y, x) points as a contiguous float64 array
+    
+    Args:
+        points: List of (y, x) tuples
+        axis: 0 for y, 1 for x
+    """
+    return np.fromiter((point[axis] for point in points), dtype=np.float64, count=len(points))
+
+def _orders_at_stops(route, orders):
+    """
+    Find the orders picked up or dropped off at each stop of a route
+    
+    Args:
+        route: List of (y, x) stops
+        orders: List of Order objects
+    
+    Returns:
+        Tuple of (starts, order_indices) in CSR layout: the orders at stop i are
+        order_indices[starts[i]:starts[i + 1]], in ascending order
+    """
+    # Hash each location to the orders using it once, instead of comparing every
+    # stop against every order
+    orders_at = {}
+    for k, order in enumerate(orders):
+        orders_at.setdefault(order.pickup, set()).add(k)
+        orders_at.setdefault(order.dropoff, set()).add(k)
+    
+    per_stop = [sorted(orders_at.get(stop, ())) for stop in route]
+    starts = np.zeros(len(route) + 1, dtype=np.int64)
+    np.cumsum([len(indices) for indices in per_stop], out=starts[1:])
+    order_indices = np.fromiter((k for indices in per_stop for k in indices), dtype=np.int64, count=starts[-1])
+    return starts, order_indices
+
+@njit(cache=True)
+def _simulate_capacity(route_y, route_x, stop_starts, stop_orders,
+                       pickup_y, pickup_x, dropoff_y, dropoff_x, weights, max_cap):
+    """
+    Simulate a truck's remaining capacity along its route
+    
+    Each stop after the start picks up the first matching order not yet picked up,
+    or drops off the first matching order already picked up. Only the orders listed
+    for a stop by _orders_at_stops are considered.
+    
+    Returns:
+        Tuple of (positions, capacities, op_types, order_indices), one entry per event,
+        starting with the OP_START event at position 0 (order index -1)
+    """
+    num_stops = route_y.shape[0]
+    num_orders = weights.shape[0]
+    positions = np.empty(num_stops, dtype=np.int64)
+    capacities = np.empty(num_stops, dtype=np.float64)
+    op_types = np.empty(num_stops, dtype=np.int64)
+    order_indices = np.empty(num_stops, dtype=np.int64)
+    picked_up = np.zeros(num_orders, dtype=np.bool_)
+    
+    current_capacity = max_cap
+    positions[0] = 0
+    capacities[0] = current_capacity
+    op_types[0] = OP_START
+    order_indices[0] = -1
+    count = 1
+    
+    for i in range(1, num_stops):  # Skip first stop (starting point)
+        for j in range(stop_starts[i], stop_starts[i + 1]):
+            k = stop_orders[j]
+            if route_y[i] == pickup_y[k] and route_x[i] == pickup_x[k] and not picked_up[k]:
+                current_capacity -= weights[k]
+                picked_up[k] = True
+                op_type = OP_PICKUP
+            elif route_y[i] == dropoff_y[k] and route_x[i] == dropoff_x[k] and picked_up[k]:
+                current_capacity += weights[k]
+                op_type = OP_DROPOFF
+            else:
+                continue
+            positions[count] = i
+            capacities[count] = current_capacity
+            op_types[count] = op_type
+            order_indices[count] = k
+            count += 1
+            break
+    
+    return positions[:count], capacities[:count], op_types[:count], order_indices[:count]
+
 class ACOVisualization:
     def __init__(self, location_data=None):
         """
@@ -20,11 +156,24 @@ class ACOVisualization:
             location_data: Pandas DataFrame with columns ['id', 'x', 'y'] or None
         """
         self.location_data = location_data
+        self._xy = None  # (n, 2) array of the (y, x) coordinates in location_data
+        if location_data is not None:
+            self._cache_coordinates()
         self.ciaco = CIACO(num_ants=15, iterations=50, alpha=1.0, beta=2.0)
+        self._rng = np.random.default_rng()
         self.network_graph = None
+        self.network_graph_proj = None  # network_graph projected to a planar CRS in metres
+        self._to_projected = None  # Transformer from lat/lon to the projected CRS
+        self._xy_proj = None  # _xy projected to (northing, easting) metres
         self.trucks = {}
         self.orders = {}
         self.node_mapping = {}  # Maps (lat, lon) to network node
+        self._node_xy = {}  # Maps network node to its (lat, lon)
+        self._node_ids = None  # Node IDs in the order of the points in _node_tree
+        self._node_tree = None  # KD-tree over projected node coordinates for nearest-node lookups
+        self._road_csr = None  # Edge lengths in metres as a CSR matrix indexed like _node_ids
+        self._segment_cache = {}  # Maps (source node, target node) to the segment's (lat, lon) path
+        self._predecessors = {}  # Maps source node to the shortest-path predecessors of every reachable node
         
     def load_data_from_csv(self, filename):
         """
@@ -33,7 +182,7 @@ class ACOVisualization:
         Args:
             filename: Path to the CSV file
         """
-        self.location_data = pd.read_csv(filename)
+        self.location_data = read_csv(filename)
         
         # Ensure the dataframe has the required columns
         if 'id' not in self.location_data.columns:
@@ -43,9 +192,23 @@ class ACOVisualization:
         if 'Latitude' in self.location_data.columns and 'y' not in self.location_data.columns:
             self.location_data = self.location_data.rename(columns={"Latitude": "y", "Longitude": "x"})
             
+        self._cache_coordinates()
         print(f"Loaded {len(self.location_data)} locations")
         return self.location_data
     
+    def _cache_coordinates(self):
+        """Materialize the (y, x) columns of location_data as a NumPy array for fast indexing"""
+        self._xy = self.location_data[['y', 'x']].to_numpy(dtype=np.float64, copy=True)
+    
+    def _location_point(self, idx):
+        """
+        Get the (y, x) tuple of a row of location_data
+        
+        Args:
+            idx: Positional row index
+        """
+        return tuple(self._xy[idx].tolist())
+    
     def create_street_network(self, center_point=None, distance=25000):
         """
         Create a street network around a center point
@@ -56,15 +219,38 @@ class ACOVisualization:
         """
         if center_point is None and self.location_data is not None and len(self.location_data) > 0:
             # Use the first point as the center
-            center_point = (self.location_data.iloc[0]['y'], self.location_data.iloc[0]['x'])
+            center_point = self._location_point(0)
         
         if center_point is None:
             raise ValueError("No center point provided and no location data available")
             
-        print(f"Creating street network around {center_point} with {distance}m radius")
-        self.network_graph = ox.graph_from_point(center_point, dist=distance, network_type="drive")
-        self.network_graph = ox.add_edge_speeds(self.network_graph)
-        self.network_graph = ox.add_edge_travel_times(self.network_graph)
+        # Reuse an annotated graph saved by an earlier run for the same area
+        graph_file = os.path.join(
+            GRAPH_CACHE_DIR, f"drive_{center_point[0]:.3f}_{center_point[1]:.3f}_{distance}.graphml"
+        )
+        if os.path.exists(graph_file):
+            print(f"Loading cached street network from {graph_file}")
+            self.network_graph = ox.load_graphml(graph_file)
+        else:
+            print(f"Creating street network around {center_point} with {distance}m radius")
+            self.network_graph = ox.graph_from_point(center_point, dist=distance, network_type="drive")
+            self.network_graph = ox.add_edge_speeds(self.network_graph)
+            self.network_graph = ox.add_edge_travel_times(self.network_graph)
+            ox.save_graphml(self.network_graph, graph_file)
+        
+        # Node coordinates and cached paths belong to the new graph
+        self._node_xy = {node: (data['y'], data['x']) for node, data in self.network_graph.nodes(data=True)}
+        self._segment_cache = {}
+        self._predecessors = {}
+        
+        # Project once so nearest-node queries and distances are planar, in metres
+        self.network_graph_proj = ox.project_graph(self.network_graph)
+        self._to_projected = Transformer.from_crs("EPSG:4326", self.network_graph_proj.graph['crs'], always_xy=True)
+        self._node_ids = np.array(list(self.network_graph_proj.nodes))
+        self._node_tree = cKDTree(np.array(
+            [(data['y'], data['x']) for _, data in self.network_graph_proj.nodes(data=True)], dtype=np.float64
+        ))
+        self._road_csr = self._graph_to_csr(self.network_graph_proj)
         
         # Map all locations to network nodes
         if self.location_data is not None:
@@ -72,6 +258,57 @@ class ACOVisualization:
             
         return self.network_graph
     
+    def _graph_to_csr(self, graph):
+        """
+        Edge lengths of a street network as a sparse matrix for scipy's graph routines
+        
+        Args:
+            graph: Street network whose nodes are in the order of _node_ids
+            
+        Returns:
+            (n, n) CSR matrix of edge lengths in metres; of parallel edges the shortest is kept
+        """
+        node_index = {node: i for i, node in enumerate(self._node_ids.tolist())}
+        num_nodes = len(node_index)
+        num_edges = graph.number_of_edges()
+        u = np.fromiter((node_index[node] for node, _ in graph.edges()), dtype=np.int64, count=num_edges)
+        v = np.fromiter((node_index[node] for _, node in graph.edges()), dtype=np.int64, count=num_edges)
+        lengths = np.fromiter((data['length'] for _, _, data in graph.edges(data=True)),
+                              dtype=np.float64, count=num_edges)
+        
+        # The matrix would add up parallel edges, so keep only the shortest of each pair
+        order = np.argsort(lengths, kind='stable')
+        _, first = np.unique((u * num_nodes + v)[order], return_index=True)
+        keep = order[first]
+        return csr_matrix((lengths[keep], (u[keep], v[keep])), shape=(num_nodes, num_nodes))
+    
+    def _road_distance_matrices(self, stop_arrays):
+        """
+        Road distances between the stops of each truck, from one Dijkstra run over all their nodes
+        
+        Args:
+            stop_arrays: List of (n, 2) arrays of (y, x) stops
+            
+        Returns:
+            List of (n, n) distance matrices in metres; pairs the road network does not
+            connect fall back to their straight-line distance
+        """
+        stop_nodes = [self._node_tree.query(self._project_points(stops_xy))[1] for stops_xy in stop_arrays]
+        sources, source_row = np.unique(np.concatenate(stop_nodes), return_inverse=True)
+        road = dijkstra(self._road_csr, directed=True, indices=sources)
+        
+        matrices = []
+        offset = 0
+        for stops_xy, nodes in zip(stop_arrays, stop_nodes):
+            rows = source_row[offset:offset + len(nodes)]
+            offset += len(nodes)
+            distances = road[rows][:, nodes]
+            projected = self._project_points(stops_xy)
+            straight = np.hypot(projected[:, None, 0] - projected[None, :, 0],
+                                projected[:, None, 1] - projected[None, :, 1])
+            matrices.append(np.where(np.isfinite(distances), distances, straight))
+        return matrices
+    
     def _map_locations_to_nodes(self):
         """Map all locations to their nearest network nodes"""
         if self.network_graph is None:
@@ -79,10 +316,10 @@ class ACOVisualization:
             
         print("Mapping locations to network nodes...")
         
-        # For each point in location_data, find the nearest node
-        for _, row in self.location_data.iterrows():
-            point = (row['y'], row['x'])
-            nearest_node = ox.distance.nearest_nodes(self.network_graph, row['x'], row['y'])
+        # Find the nearest node of every point in one batched query against the node index
+        self._xy_proj = self._project_points(self._xy)
+        _, idx = self._node_tree.query(self._xy_proj)
+        for point, nearest_node in zip(map(tuple, self._xy.tolist()), self._node_ids[idx].tolist()):
             self.node_mapping[point] = nearest_node
             
         print(f"Mapped {len(self.node_mapping)} locations to network nodes")
@@ -113,26 +350,28 @@ class ACOVisualization:
         """
         self.trucks = {}
         
+        # Draw all capacities at once
+        capacities = self._rng.integers(max_capacity//2, max_capacity, size=num_trucks, endpoint=True).tolist()
+        
         if start_location is None and self.location_data is not None:
             # Use random points from the location data as starting points
-            start_indices = random.sample(range(len(self.location_data)), min(num_trucks, len(self.location_data)))
+            start_indices = self._rng.choice(len(self.location_data), size=min(num_trucks, len(self.location_data)),
+                                             replace=False)
             for i, idx in enumerate(start_indices):
                 truck_id = f"T{i+1}"
-                location = (self.location_data.iloc[idx]['y'], self.location_data.iloc[idx]['x'])
-                capacity = random.randint(max_capacity//2, max_capacity)
-                self.trucks[truck_id] = Truck(truck_id, location, capacity)
+                location = self._location_point(idx)
+                self.trucks[truck_id] = Truck(truck_id, location, capacities[i])
         else:
             # Use the provided start location or the first location in the data
             if start_location is None and self.location_data is not None:
-                start_location = (self.location_data.iloc[0]['y'], self.location_data.iloc[0]['x'])
+                start_location = self._location_point(0)
             
             if start_location is None:
                 raise ValueError("No start location provided and no location data available")
                 
             for i in range(num_trucks):
                 truck_id = f"T{i+1}"
-                capacity = random.randint(max_capacity//2, max_capacity)
-                self.trucks[truck_id] = Truck(truck_id, start_location, capacity)
+                self.trucks[truck_id] = Truck(truck_id, start_location, capacities[i])
                 
         return self.trucks
     
@@ -147,19 +386,38 @@ class ACOVisualization:
         if self.location_data is None or len(self.location_data) < 2:
             raise ValueError("Not enough location data to create orders")
             
+        # Select random, distinct pickup and dropoff locations and weights for all orders at once;
+        # a nonzero offset modulo the number of locations never lands on the pickup itself
+        num_locations = len(self.location_data)
+        pickup_indices = self._rng.integers(0, num_locations, size=num_orders)
+        dropoff_indices = (pickup_indices + self._rng.integers(1, num_locations, size=num_orders)) % num_locations
+        weights = self._rng.integers(max_weight//10, max_weight, size=num_orders, endpoint=True)
+        
         self.orders = {}
+        return self.add_orders([f"O{i+1}" for i in range(num_orders)], weights,
+                               self._xy[pickup_indices], self._xy[dropoff_indices])
+    
+    def add_orders(self, order_ids, weights, pickups, dropoffs):
+        """
+        Add many orders in one call
         
-        for i in range(num_orders):
-            # Select random pickup and dropoff locations
-            pickup_idx, dropoff_idx = random.sample(range(len(self.location_data)), 2)
-            
-            order_id = f"O{i+1}"
-            pickup = (self.location_data.iloc[pickup_idx]['y'], self.location_data.iloc[pickup_idx]['x'])
-            dropoff = (self.location_data.iloc[dropoff_idx]['y'], self.location_data.iloc[dropoff_idx]['x'])
-            weight = random.randint(max_weight//10, max_weight)
-            
-            self.orders[order_id] = Order(order_id, weight, pickup, dropoff)
+        Args:
+            order_ids: Sequence of order IDs
+            weights: Sequence or array of order weights
+            pickups: (n, 2) array-like of (y, x) pickup points
+            dropoffs: (n, 2) array-like of (y, x) dropoff points
             
+        Returns:
+            Dictionary of all orders
+        """
+        # Convert the columns to Python values in bulk rather than element by element
+        weights = np.asarray(weights).tolist()
+        pickups = map(tuple, np.asarray(pickups, dtype=np.float64).reshape(-1, 2).tolist())
+        dropoffs = map(tuple, np.asarray(dropoffs, dtype=np.float64).reshape(-1, 2).tolist())
+        self.orders.update(
+            (order_id, Order(order_id, weight, pickup, dropoff))
+            for order_id, weight, pickup, dropoff in zip(order_ids, weights, pickups, dropoffs)
+        )
         return self.orders
     
     def assign_orders_to_trucks(self, strategy="greedy"):
@@ -177,7 +435,7 @@ class ACOVisualization:
         # Reset truck assignments
         for truck in self.trucks.values():
             truck.assigned_orders = []
-            truck.update_capacity()
+            truck.recompute_capacity()
             
         if strategy == "greedy":
             # Assign each order to the truck with the most remaining capacity
@@ -194,63 +452,85 @@ class ACOVisualization:
                     best_truck.add_order(order)
         
         elif strategy == "balanced":
-            # Sort orders by weight (heaviest first)
-            sorted_orders = sorted(self.orders.items(), key=lambda x: x[1].weight, reverse=True)
-            
-            # Sort trucks by capacity (largest first)
-            sorted_trucks = sorted(self.trucks.items(), key=lambda x: x[1].max_capacity, reverse=True)
-            
-            # Assign orders round-robin to balance load
-            for i, (order_id, order) in enumerate(sorted_orders):
-                assigned = False
-                
-                # Try each truck in rotation
-                for j in range(len(sorted_trucks)):
-                    truck_idx = (i + j) % len(sorted_trucks)
-                    truck = sorted_trucks[truck_idx][1]
-                    
-                    if truck.remaining_capacity >= order.weight:
-                        truck.add_order(order)
-                        assigned = True
-                        break
+            # Heaviest orders first, each to the truck with the most remaining capacity;
+            # if that truck cannot take the order, no truck can
+            orders = list(self.orders.values())
+            trucks = list(self.trucks.values())
+            weights = np.fromiter((order.weight for order in orders), dtype=np.float64, count=len(orders))
+            
+            # Max-heap of trucks keyed on remaining capacity
+            heap = [(-truck.remaining_capacity, truck_idx) for truck_idx, truck in enumerate(trucks)]
+            heapq.heapify(heap)
+            
+            for order_idx in np.argsort(-weights, kind="stable"):
+                order = orders[order_idx]
+                neg_capacity, truck_idx = heap[0]
                 
-                if not assigned:
-                    print(f"Could not assign order {order_id} (weight {order.weight}) to any truck")
+                if -neg_capacity >= order.weight:
+                    truck = trucks[truck_idx]
+                    truck.add_order(order)
+                    heapq.heapreplace(heap, (-truck.remaining_capacity, truck_idx))
+                else:
+                    print(f"Could not assign order {order.order_id} (weight {order.weight}) to any truck")
         
         elif strategy == "nearest":
-            # Assign each order to the nearest truck that has capacity
-            for order_id, order in self.orders.items():
-                best_truck = None
-                best_distance = float('inf')
+            # Match orders to trucks one-to-one, minimizing the total truck-to-pickup distance
+            orders = list(self.orders.values())
+            trucks = list(self.trucks.values())
+            orders_xy = self._project_points([order.pickup for order in orders])
+            trucks_xy = self._project_points([truck.current_location for truck in trucks])
+            cost = np.hypot(orders_xy[:, None, 0] - trucks_xy[None, :, 0],
+                            orders_xy[:, None, 1] - trucks_xy[None, :, 1])
+            
+            # Penalize pairs where the order does not fit the truck with a cost
+            weights = np.array([order.weight for order in orders], dtype=float)
+            capacities = np.array([truck.remaining_capacity for truck in trucks], dtype=float)
+            # just above any feasible matching, which keeps the solver's arithmetic in range
+            feasible = capacities[None, :] >= weights[:, None]
+            cost[~feasible] = cost[feasible].sum() + 1
+            
+            matched = set()
+            for order_idx, truck_idx in zip(*linear_sum_assignment(cost)):
+                if feasible[order_idx, truck_idx]:
+                    trucks[truck_idx].add_order(orders[order_idx])
+                    matched.add(order_idx)
+            
+            # Orders left over once every truck has one go to the nearest truck that has capacity
+            remaining = np.array([truck.remaining_capacity for truck in trucks], dtype=float)
+            for order_idx, order in enumerate(orders):
+                if order_idx in matched:
+                    continue
+                distances = cost[order_idx].copy()
+                distances[remaining < order.weight] = np.inf
+                best = int(distances.argmin())
                 
-                for truck_id, truck in self.trucks.items():
-                    if truck.remaining_capacity >= order.weight:
-                        # Calculate distance from truck to pickup
-                        distance = self._calculate_distance(truck.current_location, order.pickup)
-                        
-                        if distance < best_distance:
-                            best_truck = truck
-                            best_distance = distance
-                
-                if best_truck:
-                    best_truck.add_order(order)
+                if np.isfinite(distances[best]):
+                    trucks[best].add_order(order)
+                    remaining[best] -= order.weight
                 else:
-                    print(f"Could not assign order {order_id} (weight {order.weight}) to any truck")
+                    print(f"Could not assign order {order.order_id} (weight {order.weight}) to any truck")
         
         # Print assignment summary
         for truck_id, truck in self.trucks.items():
             total_weight = sum(order.weight for order in truck.assigned_orders)
             print(f"Truck {truck_id}: {len(truck.assigned_orders)} orders, {total_weight}/{truck.max_capacity} capacity used")
             
-    def _calculate_distance(self, point1, point2):
+    def _project_points(self, points):
         """
-        Calculate Euclidean distance between two points
+        Project (y, x) lat/lon points to the planar CRS of the street network
         
         Args:
-            point1: (y, x) tuple for first point
-            point2: (y, x) tuple for second point
+            points: (y, x) tuple or (n, 2) array-like of (y, x) coordinates
+            
+        Returns:
+            (n, 2) array of (northing, easting) in metres, or of the unchanged
+            coordinates when no street network has been created
         """
-        return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self._to_projected is None:
+            return points
+        easting, northing = self._to_projected.transform(points[:, 1], points[:, 0])
+        return np.column_stack((northing, easting))
     
     def optimize_routes(self):
         """
@@ -259,31 +539,58 @@ class ACOVisualization:
         if not self.trucks:
             raise ValueError("No trucks created. Call create_trucks first.")
             
+        jobs = []
         for truck_id, truck in self.trucks.items():
             if not truck.assigned_orders:
                 print(f"Truck {truck_id} has no assigned orders, skipping route optimization")
                 continue
                 
-            # Create a list of stops: start with current location, then pickups, then dropoffs
-            stops = [truck.current_location]
-            
-            # Add all pickups first
-            for order in truck.assigned_orders:
-                stops.append(order.pickup)
-                
-            # Then add all dropoffs
-            for order in truck.assigned_orders:
-                stops.append(order.dropoff)
-                
-            # Optimize route with CIACO
-            print(f"Optimizing route for truck {truck_id} with {len(stops)} stops")
-            try:
-                optimized_route = self.ciaco.optimize_route(stops)
-                truck.route = optimized_route
-                print(f"Route optimized with {len(optimized_route)} stops")
-            except Exception as e:
-                print(f"Error optimizing route for truck {truck_id}: {e}")
-                truck.route = stops
+            # Build the stops as one array: start with current location, then pickups, then dropoffs
+            num_orders = len(truck.assigned_orders)
+            stops_xy = np.empty((1 + 2 * num_orders, 2), dtype=np.float64)
+            stops_xy[0] = truck.current_location
+            stops_xy[1:1 + num_orders] = [order.pickup for order in truck.assigned_orders]
+            stops_xy[1 + num_orders:] = [order.dropoff for order in truck.assigned_orders]
+            print(f"Optimizing route for truck {truck_id} with {len(stops_xy)} stops")
+            jobs.append((truck_id, truck, stops_xy))
+        
+        if not jobs:
+            return
+            
+        # With a street network the ants compare road distances rather than straight lines
+        if self._road_csr is not None:
+            distance_matrices = self._road_distance_matrices([stops_xy for _, _, stops_xy in jobs])
+        else:
+            distance_matrices = [None] * len(jobs)
+            
+        # Trucks are independent, so their routes are optimized in parallel processes
+        seeds = [random.randrange(2**31) for _ in jobs]
+        # Spawned workers: forking after Numba has started its thread pool hangs the process at exit
+        if len(jobs) > 1:
+            pool = ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1),
+                                       mp_context=multiprocessing.get_context('spawn'))
+        else:
+            pool = contextlib.nullcontext()
+
+        with pool as executor:
+            futures = None
+            if executor is not None:
+                futures = [executor.submit(_optimize_truck_route, self.ciaco, stops_xy, seed, distance_matrix)
+                           for (_, _, stops_xy), seed, distance_matrix in zip(jobs, seeds, distance_matrices)]
+
+            for job_idx, (truck_id, truck, stops_xy) in enumerate(jobs):
+                stops = [tuple(stop) for stop in stops_xy.tolist()]
+                try:
+                    if futures is None:
+                        route_idx = _optimize_truck_route(self.ciaco, stops_xy, seeds[job_idx],
+                                                          distance_matrices[job_idx])
+                    else:
+                        route_idx = futures[job_idx].result()
+                    truck.route = [stops[i] for i in route_idx]
+                    print(f"Route optimized for truck {truck_id} with {len(truck.route)} stops")
+                except Exception as e:
+                    print(f"Error optimizing route for truck {truck_id}: {e}")
+                    truck.route = stops
     
     def _get_node_for_point(self, point):
         """
@@ -302,10 +609,39 @@ class ACOVisualization:
             raise ValueError("No network graph created. Call create_street_network first.")
             
         # Find the nearest node
-        nearest_node = ox.distance.nearest_nodes(self.network_graph, point[1], point[0])
+        _, idx = self._node_tree.query(self._project_points(point)[0])
+        nearest_node = self._node_ids[idx].item()
         self.node_mapping[point] = nearest_node
         return nearest_node
     
+    def _shortest_path(self, source, target):
+        """
+        Get the fastest path between two network nodes
+        
+        One Dijkstra run per source node records the predecessors of every reachable
+        node, so later paths from the same source only walk that tree back.
+        
+        Args:
+            source: Start node ID
+            target: End node ID
+            
+        Returns:
+            List of node IDs from source to target
+        """
+        if source not in self._predecessors:
+            self._predecessors[source], _ = nx.dijkstra_predecessor_and_distance(
+                self.network_graph, source, weight='travel_time'
+            )
+        predecessors = self._predecessors[source]
+        if target not in predecessors:
+            raise nx.NetworkXNoPath(f"Node {target} not reachable from {source}")
+            
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]][0])
+        path.reverse()
+        return path
+    
     def _get_road_path_between_points(self, point1, point2):
         """
         Get the actual road path between two points using the network graph
@@ -324,30 +660,32 @@ class ACOVisualization:
         node1 = self._get_node_for_point(point1)
         node2 = self._get_node_for_point(point2)
         
+        # Segments repeat across trucks and renders; the graph is directed, so only
+        # the same (source, target) pair can reuse a path
+        segment = (node1, node2)
+        if segment in self._segment_cache:
+            return self._segment_cache[segment]
+            
         try:
-            # Get the shortest path between the nodes
-            path = nx.shortest_path(self.network_graph, source=node1, target=node2, weight='travel_time')
+            path = self._shortest_path(node1, node2)
             
             # Extract the coordinates for each node in the path
-            coords = []
-            for node in path:
-                y = self.network_graph.nodes[node]['y']
-                x = self.network_graph.nodes[node]['x']
-                coords.append((y, x))
-                
+            coords = [self._node_xy[node] for node in path]
+            self._segment_cache[segment] = coords
             return coords
         except Exception as e:
             print(f"Error finding path between {point1} and {point2}: {e}")
             # If there's an error, return just the endpoints
             return [point1, point2]
                 
-    def visualize_on_map(self, center=None, use_road_network=True):
+    def visualize_on_map(self, center=None, use_road_network=True, simplify_tolerance=1e-4):
         """
         Create an interactive map with trucks, orders, and routes
         
         Args:
             center: (y, x) tuple for map center or None to auto-center
             use_road_network: Whether to use the actual road network for paths (True) or direct lines (False)
+            simplify_tolerance: Douglas-Peucker tolerance in degrees for road paths (0 keeps every node)
         """
         if not self.trucks and not self.orders:
             raise ValueError("No trucks or orders created")
@@ -370,7 +708,7 @@ class ACOVisualization:
         # Determine map center
         if center is None:
             if self.location_data is not None and len(self.location_data) > 0:
-                center = (self.location_data['y'].mean(), self.location_data['x'].mean())
+                center = tuple(self._xy.mean(axis=0).tolist())
             elif self.trucks:
                 # Use the first truck's location
                 center = next(iter(self.trucks.values())).current_location
@@ -382,9 +720,16 @@ class ACOVisualization:
                 
         # Create map
         map_obj = folium.Map(location=center, tiles="cartodbpositron", zoom_start=12)
+        truck_layer = folium.FeatureGroup(name="Trucks").add_to(map_obj)
+        route_layer = folium.FeatureGroup(name="Routes").add_to(map_obj)
+        
+        # Stop markers are collected as [y, x, color, icon, popup] rows and drawn
+        # client-side by a single marker cluster per layer
+        stop_markers = []
+        unassigned_markers = []
         
         # Add trucks to map
-        for truck_id, truck in self.trucks.items():
+        for truck_idx, (truck_id, truck) in enumerate(self.trucks.items()):
             # Create a popup with truck info
             popup_text = f"""
             <b>Truck {truck_id}</b><br>
@@ -397,39 +742,43 @@ class ACOVisualization:
                 location=truck.current_location,
                 popup=popup_text,
                 icon=folium.Icon(color='green', icon='truck', prefix='fa')
-            ).add_to(map_obj)
+            ).add_to(truck_layer)
             
             # Add route if it exists
-            if hasattr(truck, 'route') and len(truck.route) > 1:
-                # Generate a color for this truck's route
-                color = f"#{random.randint(0, 255):02x}{random.randint(0, 255):02x}{random.randint(0, 255):02x}"
+            if len(truck.route) > 1:
+                # Deterministic, distinct color per truck from the tab20 palette
+                color = to_hex(cm.tab20(truck_idx % cm.tab20.N))
+                route_label = f"Truck {truck_id} route"
                 
                 if use_road_network:
-                    # Add each segment of the route using road network
-                    for i in range(len(truck.route) - 1):
-                        start_point = truck.route[i]
-                        end_point = truck.route[i + 1]
-                        
-                        # Get the actual road path between the points
-                        path_coords = self._get_road_path_between_points(start_point, end_point)
-                        
-                        # Add the path segment to the map
-                        folium.PolyLine(
-                            locations=path_coords,
-                            color=color,
-                            weight=4,
-                            opacity=0.7,
-                            popup=f"Truck {truck_id} route segment {i+1}"
-                        ).add_to(map_obj)
+                    # Join the road path of every segment into one line for the whole route
+                    route_coords = []
+                    for start_point, end_point in zip(truck.route, truck.route[1:]):
+                        route_coords.extend(self._get_road_path_between_points(start_point, end_point))
+                    
+                    # Drop nearly collinear road nodes before they are written to the map
+                    if simplify_tolerance > 0 and len(route_coords) > 2:
+                        route_coords = list(LineString(route_coords).simplify(
+                            simplify_tolerance, preserve_topology=False
+                        ).coords)
                 else:
-                    # Add direct route as a PolyLine (original behavior)
-                    folium.PolyLine(
-                        locations=truck.route,
-                        color=color,
-                        weight=4,
-                        opacity=0.7,
-                        popup=f"Truck {truck_id} route"
-                    ).add_to(map_obj)
+                    # Direct route between the stops (original behavior)
+                    route_coords = truck.route
+                    
+                folium.PolyLine(
+                    locations=route_coords,
+                    color=color,
+                    weight=4,
+                    opacity=0.7,
+                    popup=route_label
+                ).add_to(route_layer)
+                
+                # Map each pickup and dropoff location to the first order using it
+                pickup_map = {}
+                dropoff_map = {}
+                for order in truck.assigned_orders:
+                    pickup_map.setdefault(order.pickup, order)
+                    dropoff_map.setdefault(order.dropoff, order)
                 
                 # Add markers for each stop with order info
                 for i, stop in enumerate(truck.route):
@@ -438,57 +787,45 @@ class ACOVisualization:
                         continue
                         
                     # Determine if this is a pickup or dropoff
-                    is_pickup = any(order.pickup == stop for order in truck.assigned_orders)
-                    is_dropoff = any(order.dropoff == stop for order in truck.assigned_orders)
-                    
-                    if is_pickup:
+                    order = pickup_map.get(stop)
+                    if order is not None:
                         icon_color = 'blue'
                         icon_name = 'arrow-up'
                         stop_type = 'Pickup'
-                    elif is_dropoff:
-                        icon_color = 'red'
-                        icon_name = 'arrow-down'
-                        stop_type = 'Dropoff'
                     else:
-                        icon_color = 'gray'
-                        icon_name = 'circle'
-                        stop_type = 'Stop'
+                        order = dropoff_map.get(stop)
+                        if order is not None:
+                            icon_color = 'red'
+                            icon_name = 'arrow-down'
+                            stop_type = 'Dropoff'
+                        else:
+                            icon_color = 'gray'
+                            icon_name = 'circle'
+                            stop_type = 'Stop'
                     
-                    # Find the order for this stop
+                    # Order info for this stop
                     order_info = ""
-                    for order in truck.assigned_orders:
-                        if order.pickup == stop or order.dropoff == stop:
-                            order_info = f"<br>Order: {order.order_id}<br>Weight: {order.weight}"
-                            break
+                    if order is not None:
+                        order_info = f"<br>Order: {order.order_id}<br>Weight: {order.weight}"
                     
-                    # Add marker
-                    folium.Marker(
-                        location=stop,
-                        popup=f"{stop_type} {i}{order_info}",
-                        icon=folium.Icon(color=icon_color, icon=icon_name, prefix='fa')
-                    ).add_to(map_obj)
+                    stop_markers.append([stop[0], stop[1], icon_color, icon_name, f"{stop_type} {i}{order_info}"])
         
         # Add unassigned orders to map
-        assigned_orders = set()
-        for truck in self.trucks.values():
-            for order in truck.assigned_orders:
-                assigned_orders.add(order.order_id)
+        assigned_orders = {order.order_id for truck in self.trucks.values() for order in truck.assigned_orders}
         
         for order_id, order in self.orders.items():
             if order_id not in assigned_orders:
-                # Add pickup marker
-                folium.Marker(
-                    location=order.pickup,
-                    popup=f"Unassigned Pickup: {order_id}<br>Weight: {order.weight}",
-                    icon=folium.Icon(color='orange', icon='arrow-up', prefix='fa')
-                ).add_to(map_obj)
-                
-                # Add dropoff marker
-                folium.Marker(
-                    location=order.dropoff,
-                    popup=f"Unassigned Dropoff: {order_id}<br>Weight: {order.weight}",
-                    icon=folium.Icon(color='orange', icon='arrow-down', prefix='fa')
-                ).add_to(map_obj)
+                unassigned_markers.append([order.pickup[0], order.pickup[1], 'orange', 'arrow-up',
+                                           f"Unassigned Pickup: {order_id}<br>Weight: {order.weight}"])
+                unassigned_markers.append([order.dropoff[0], order.dropoff[1], 'orange', 'arrow-down',
+                                           f"Unassigned Dropoff: {order_id}<br>Weight: {order.weight}"])
+        
+        if stop_markers:
+            FastMarkerCluster(stop_markers, callback=STOP_MARKER_CALLBACK, name="Stops").add_to(map_obj)
+        if unassigned_markers:
+            FastMarkerCluster(unassigned_markers, callback=STOP_MARKER_CALLBACK,
+                              name="Unassigned orders").add_to(map_obj)
+        folium.LayerControl().add_to(map_obj)
                 
         return map_obj
     
@@ -500,7 +837,7 @@ class ACOVisualization:
             raise ValueError("No trucks created. Call create_trucks first.")
             
         # Count number of trucks with routes
-        trucks_with_routes = sum(1 for truck in self.trucks.values() if hasattr(truck, 'route') and len(truck.route) > 1)
+        trucks_with_routes = sum(1 for truck in self.trucks.values() if len(truck.route) > 1)
         
         if trucks_with_routes == 0:
             raise ValueError("No trucks have routes. Call optimize_routes first.")
@@ -517,49 +854,36 @@ class ACOVisualization:
         
         # Plot each truck's capacity timeline
         for truck_id, truck in self.trucks.items():
-            if not hasattr(truck, 'route') or len(truck.route) <= 1:
+            if len(truck.route) <= 1:
                 continue
                 
             ax = axes[ax_index]
             ax_index += 1
             
-            # Initialize capacity at starting value
-            current_capacity = truck.max_capacity
-            capacities = [current_capacity]
-            labels = ["Start"]
-            positions = [0]
-            
-            # Track order pickup/dropoff status
-            order_status = {order.order_id: {"picked_up": False} for order in truck.assigned_orders}
-            
-            # Simulate route traversal
-            for i, stop in enumerate(truck.route[1:], 1):  # Skip first stop (starting point)
-                # Check if this stop is a pickup or dropoff
-                for order in truck.assigned_orders:
-                    # If it's a pickup and not already picked up
-                    if stop == order.pickup and not order_status[order.order_id]["picked_up"]:
-                        current_capacity -= order.weight
-                        capacities.append(current_capacity)
-                        labels.append(f"Pickup {order.order_id}")
-                        positions.append(i)
-                        order_status[order.order_id]["picked_up"] = True
-                        break
-                        
-                    # If it's a dropoff and already picked up
-                    elif stop == order.dropoff and order_status[order.order_id]["picked_up"]:
-                        current_capacity += order.weight
-                        capacities.append(current_capacity)
-                        labels.append(f"Dropoff {order.order_id}")
-                        positions.append(i)
-                        break
+            # Simulate route traversal on plain arrays
+            orders = truck.assigned_orders
+            positions, capacities, op_types, order_indices = _simulate_capacity(
+                _coordinate_column(truck.route, 0), _coordinate_column(truck.route, 1),
+                *_orders_at_stops(truck.route, orders),
+                _coordinate_column([order.pickup for order in orders], 0),
+                _coordinate_column([order.pickup for order in orders], 1),
+                _coordinate_column([order.dropoff for order in orders], 0),
+                _coordinate_column([order.dropoff for order in orders], 1),
+                np.fromiter((order.weight for order in orders), dtype=np.float64, count=len(orders)),
+                float(truck.max_capacity)
+            )
+            labels = [
+                "Start" if op_type == OP_START else f"{OPERATION_LABELS[op_type]} {orders[order_idx].order_id}"
+                for op_type, order_idx in zip(op_types, order_indices)
+            ]
             
             # Plot capacity timeline
-            ax.step(positions, capacities, where='post', linewidth=2, 
-                    color=f"#{random.randint(0, 200):02x}{random.randint(0, 200):02x}{random.randint(0, 200):02x}")
+            color = f"#{random.randint(0, 200):02x}{random.randint(0, 200):02x}{random.randint(0, 200):02x}"
+            ax.step(positions, capacities, where='post', linewidth=2, color=color)
             
-            # Add markers for each stop
+            # Add markers for all stops as one artist, then label each stop
+            ax.scatter(positions, capacities, s=64, color=color, zorder=3)
             for pos, cap, label in zip(positions, capacities, labels):
-                ax.plot(pos, cap, 'o', markersize=8)
                 ax.text(pos, cap + (truck.max_capacity * 0.03), label, rotation=45, ha='right')
                 
             # Set axis labels
@@ -0,0 +1,333 @@
+import numpy as np
+from numba import njit, prange, uint64
+
+try:
+    from numba import cuda
+    from numba.cuda.random import create_xoroshiro128p_states, xoroshiro128p_uniform_float32
+    CUDA_AVAILABLE = cuda.is_available()
+except ImportError:
+    CUDA_AVAILABLE = False
+
+# One warp cooperates on each ant's route
+THREADS_PER_ANT = 32
+# Largest problem whose visited bitmask fits the per-block shared array
+MAX_GPU_STOPS = 4096
+_MASK_WORDS = MAX_GPU_STOPS // 64
+
+# -------------------------------
+# Numba kernels for the CIACO Algorithm
+# -------------------------------
+
+@njit(cache=True)
+def construct_route(choice_matrix: np.ndarray, return_to_depot: bool,
+                    seed: int) -> np.ndarray:
+    """
+    Construct a single ant's route as an array of stop indices.
+
+    Args:
+        choice_matrix: (n, n) matrix of pheromone**alpha * visibility**beta
+        return_to_depot: Whether to append the depot (index 0) at the end
+        seed: Seed for the kernel's random number generator
+
+    Returns:
+        np.ndarray: Stop indices in visiting order, starting at the depot
+    """
+    np.random.seed(seed)
+    n = choice_matrix.shape[0]
+    route = np.empty(n + 1 if return_to_depot else n, dtype=np.int64)
+    # 1.0 for stops still to visit, 0.0 once visited; used as a multiplicative mask
+    unvisited = np.ones(n, dtype=choice_matrix.dtype)
+    cumulative = np.empty(n, dtype=np.float64)
+    current = 0
+    unvisited[0] = 0.0
+    route[0] = 0
+
+    for step in range(1, n):
+        # Masked cumulative weights of the current row, without per-step allocations
+        total = 0.0
+        for j in range(n):
+            total += choice_matrix[current, j] * unvisited[j]
+            cumulative[j] = total
+
+        if total > 0.0:
+            # Roulette wheel selection; 'right' skips zero-weight entries
+            next_city = np.searchsorted(cumulative, np.random.random() * total, side='right')
+            if next_city >= n:
+                # The draw rounded up to total; take the last stop that has weight
+                next_city = n - 1
+                while choice_matrix[current, next_city] * unvisited[next_city] <= 0.0:
+                    next_city -= 1
+        else:
+            # All weights underflowed: pick uniformly among unvisited stops
+            remaining = np.flatnonzero(unvisited)
+            next_city = remaining[np.random.randint(remaining.shape[0])]
+
+        route[step] = next_city
+        unvisited[next_city] = 0.0
+        current = next_city
+
+    # Return to depot if required
+    if return_to_depot:
+        route[n] = 0
+
+    return route
+
+@njit(parallel=True, cache=True)
+def run_iteration(choice_matrix: np.ndarray, distance_matrix: np.ndarray,
+                  num_ants: int, return_to_depot: bool, seed: int):
+    """
+    Let every ant of one iteration construct its route in parallel.
+
+    Args:
+        choice_matrix: (n, n) matrix of pheromone**alpha * visibility**beta
+        distance_matrix: (n, n) matrix of distances between stops
+        num_ants: Number of ants in the colony
+        return_to_depot: Whether routes end back at the depot
+        seed: Base seed; ant a uses seed + a so results do not depend on threading
+
+    Returns:
+        Tuple of (routes, distances): a (num_ants, route_length) array of stop
+        indices and the total distance of each route
+    """
+    n = choice_matrix.shape[0]
+    route_length = n + 1 if return_to_depot else n
+    routes = np.empty((num_ants, route_length), dtype=np.int64)
+    distances = np.empty(num_ants, dtype=np.float64)
+
+    for ant in prange(num_ants):
+        route = construct_route(choice_matrix, return_to_depot, seed + ant)
+        distance = 0.0
+        for i in range(route_length - 1):
+            distance += distance_matrix[route[i], route[i + 1]]
+        routes[ant] = route
+        distances[ant] = distance
+
+    return routes, distances
+
+@njit(parallel=True, cache=True)
+def update_pheromones(pheromone_matrix: np.ndarray, edges_from: np.ndarray,
+                      edges_to: np.ndarray, contributions: np.ndarray,
+                      evaporation_rate: float, block_size: int = 64) -> None:
+    """
+    Evaporate and deposit pheromone in a single cache-blocked pass, in place.
+
+    Each (block_size, block_size) tile is scaled by (1 - evaporation_rate) and
+    then receives the deposits that fall inside it while it is still in cache.
+
+    Args:
+        pheromone_matrix: (n, n) pheromone matrix, updated in place
+        edges_from: Row index of every deposit
+        edges_to: Column index of every deposit
+        contributions: Amount deposited on each edge; repeated edges accumulate
+        evaporation_rate: Fraction of pheromone that evaporates
+        block_size: Tile edge length; 64 keeps a float32 tile within L1
+    """
+    n = pheromone_matrix.shape[0]
+    num_blocks = (n + block_size - 1) // block_size
+    num_tiles = num_blocks * num_blocks
+    retain = pheromone_matrix.dtype.type(1.0 - evaporation_rate)
+
+    # Bucket the deposits by tile with a counting sort
+    tile_of = (edges_from // block_size) * num_blocks + edges_to // block_size
+    tile_start = np.zeros(num_tiles + 1, dtype=np.int64)
+    for e in range(tile_of.shape[0]):
+        tile_start[tile_of[e] + 1] += 1
+    for t in range(num_tiles):
+        tile_start[t + 1] += tile_start[t]
+    order = np.empty(tile_of.shape[0], dtype=np.int64)
+    fill = tile_start[:-1].copy()
+    for e in range(tile_of.shape[0]):
+        order[fill[tile_of[e]]] = e
+        fill[tile_of[e]] += 1
+
+    # Each thread owns a strip of tiles, so no two threads write the same cell
+    for bi in prange(num_blocks):
+        i0 = bi * block_size
+        i1 = min(i0 + block_size, n)
+        for bj in range(num_blocks):
+            j0 = bj * block_size
+            j1 = min(j0 + block_size, n)
+            for i in range(i0, i1):
+                for j in range(j0, j1):
+                    pheromone_matrix[i, j] *= retain
+            tile = bi * num_blocks + bj
+            for k in range(tile_start[tile], tile_start[tile + 1]):
+                e = order[k]
+                pheromone_matrix[edges_from[e], edges_to[e]] += contributions[e]
+
+@njit(parallel=True, fastmath=True, cache=True)
+def pairwise_distances(points: np.ndarray) -> np.ndarray:
+    """
+    Compute the Euclidean distance between every pair of points, one row per thread.
+
+    Args:
+        points: Contiguous (n, 2) float64 array of (x, y) coordinates
+
+    Returns:
+        np.ndarray: (n, n) distance matrix with a zero diagonal
+    """
+    n = points.shape[0]
+    distances = np.empty((n, n), dtype=np.float64)
+    for i in prange(n):
+        xi = points[i, 0]
+        yi = points[i, 1]
+        for j in range(n):
+            dx = xi - points[j, 0]
+            dy = yi - points[j, 1]
+            distances[i, j] = np.sqrt(dx * dx + dy * dy)
+    return distances
+
+@njit(fastmath=True, cache=True)
+def route_quality(route: np.ndarray, pheromone_matrix: np.ndarray,
+                  visibility_matrix: np.ndarray, alpha: float, beta: float) -> float:
+    """
+    Sum pheromone**alpha * visibility**beta over the edges of a route.
+
+    Args:
+        route: Stop indices in visiting order (int64)
+        pheromone_matrix: (n, n) matrix of pheromone values
+        visibility_matrix: (n, n) matrix of visibility values
+        alpha: Pheromone importance factor
+        beta: Visibility importance factor
+
+    Returns:
+        float: Route quality score
+    """
+    quality = 0.0
+    # Unit exponents need no pow calls
+    if alpha == 1.0 and beta == 1.0:
+        for k in range(route.shape[0] - 1):
+            quality += pheromone_matrix[route[k], route[k + 1]] * visibility_matrix[route[k], route[k + 1]]
+        return quality
+    for k in range(route.shape[0] - 1):
+        i = route[k]
+        j = route[k + 1]
+        quality += pheromone_matrix[i, j] ** alpha * visibility_matrix[i, j] ** beta
+    return quality
+
+if CUDA_AVAILABLE:
+    @cuda.jit(cache=True)
+    def _construct_routes_kernel(choice_matrix, distance_matrix, return_to_depot,
+                                 rng_states, routes, distances):
+        """
+        One block per ant: the warp sums its chunks of the current row, scans the
+        chunk totals with shuffles and the owning lane locates the next stop.
+        """
+        ant = cuda.blockIdx.x
+        lane = cuda.threadIdx.x
+        n = choice_matrix.shape[0]
+        chunk = (n + THREADS_PER_ANT - 1) // THREADS_PER_ANT
+        start = min(lane * chunk, n)
+        stop = min(start + chunk, n)
+
+        # Visited stops as a bitmask, one uint64 word per 64 stops
+        visited = cuda.shared.array(_MASK_WORDS, dtype=uint64)
+        draw = cuda.shared.array(1, dtype=np.float32)
+        picked = cuda.shared.array(1, dtype=np.int64)
+        for w in range(lane, _MASK_WORDS, THREADS_PER_ANT):
+            visited[w] = uint64(0)
+        cuda.syncthreads()
+        if lane == 0:
+            visited[0] = uint64(1)
+            routes[ant, 0] = 0
+        cuda.syncthreads()
+
+        current = 0
+        distance = 0.0
+        for step in range(1, n):
+            # Masked weight of this lane's chunk of the row
+            weight = np.float32(0.0)
+            for j in range(start, stop):
+                if visited[j >> 6] & (uint64(1) << uint64(j & 63)) == 0:
+                    weight += choice_matrix[current, j]
+
+            # Inclusive warp scan of the chunk weights
+            inclusive = weight
+            offset = 1
+            while offset < THREADS_PER_ANT:
+                other = cuda.shfl_up_sync(0xffffffff, inclusive, offset)
+                if lane >= offset:
+                    inclusive += other
+                offset *= 2
+            exclusive = cuda.shfl_up_sync(0xffffffff, inclusive, 1)
+            if lane == 0:
+                exclusive = np.float32(0.0)
+            total = cuda.shfl_sync(0xffffffff, inclusive, THREADS_PER_ANT - 1)
+
+            if lane == 0:
+                draw[0] = xoroshiro128p_uniform_float32(rng_states, ant) * total
+            cuda.syncthreads()
+            r = draw[0]
+
+            if total > 0.0:
+                # Roulette wheel: the lane whose interval holds r scans its chunk
+                if weight > 0.0 and exclusive <= r and (r < inclusive or inclusive == total):
+                    acc = exclusive
+                    choice = -1
+                    last = -1
+                    for j in range(start, stop):
+                        if visited[j >> 6] & (uint64(1) << uint64(j & 63)) == 0:
+                            acc += choice_matrix[current, j]
+                            last = j
+                            if acc > r:
+                                choice = j
+                                break
+                    # Rounding can leave r just past the last unvisited weight
+                    picked[0] = choice if choice >= 0 else last
+            elif lane == 0:
+                # All weights underflowed: pick uniformly among unvisited stops
+                k = int(xoroshiro128p_uniform_float32(rng_states, ant) * (n - step))
+                for j in range(n):
+                    if visited[j >> 6] & (uint64(1) << uint64(j & 63)) == 0:
+                        picked[0] = j
+                        if k == 0:
+                            break
+                        k -= 1
+            cuda.syncthreads()
+
+            next_city = picked[0]
+            if lane == 0:
+                visited[next_city >> 6] |= uint64(1) << uint64(next_city & 63)
+                routes[ant, step] = next_city
+                distance += distance_matrix[current, next_city]
+            current = next_city
+            cuda.syncthreads()
+
+        if lane == 0:
+            # Return to depot if required
+            if return_to_depot:
+                routes[ant, n] = 0
+                distance += distance_matrix[current, 0]
+            distances[ant] = distance
+
+def run_iteration_gpu(choice_matrix: np.ndarray, device_distance_matrix,
+                      num_ants: int, return_to_depot: bool, seed: int):
+    """
+    GPU counterpart of run_iteration: every ant builds its route in its own block.
+
+    Args:
+        choice_matrix: (n, n) host matrix of pheromone**alpha * visibility**beta
+        device_distance_matrix: Device-resident (n, n) distance matrix
+        num_ants: Number of ants in the colony
+        return_to_depot: Whether routes end back at the depot
+        seed: Seed for the per-ant random number generator states
+
+    Returns:
+        Tuple of (routes, distances) as host arrays, laid out like run_iteration
+    """
+    if not CUDA_AVAILABLE:
+        raise RuntimeError("CUDA device not available")
+    n = choice_matrix.shape[0]
+    if n > MAX_GPU_STOPS:
+        raise ValueError(f"GPU route construction supports at most {MAX_GPU_STOPS} stops")
+
+    route_length = n + 1 if return_to_depot else n
+    routes = cuda.device_array((num_ants, route_length), dtype=np.int64)
+    distances = cuda.device_array(num_ants, dtype=np.float64)
+    rng_states = create_xoroshiro128p_states(num_ants, seed=seed)
+
+    _construct_routes_kernel[num_ants, THREADS_PER_ANT](
+        cuda.to_device(np.ascontiguousarray(choice_matrix, dtype=np.float32)),
+        device_distance_matrix, return_to_depot, rng_states, routes, distances
+    )
+    return routes.copy_to_host(), distances.copy_to_host()
@@ -0,0 +1,28 @@
+import pandas as pd
+
+# -------------------------------
+# Loading location data
+# -------------------------------
+
+def read_csv(filename: str) -> pd.DataFrame:
+    """
+    Read a CSV file into a pandas DataFrame, parsing it with polars when installed.
+    
+    Args:
+        filename: Path to the CSV file
+        
+    Returns:
+        pd.DataFrame: Contents of the file
+    """
+    try:
+        import polars as pl
+    except ImportError:
+        return pd.read_csv(filename)
+    
+    try:
+        # polars' parser is considerably faster; callers work on pandas objects
+        return pl.read_csv(filename).to_pandas()
+    except (pl.exceptions.PolarsError, ImportError):
+        # A file polars rejects, or no pyarrow for the conversion; pandas reads it
+        # or raises its usual errors
+        return pd.read_csv(filename)
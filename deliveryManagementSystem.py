@@ -1,8 +1,9 @@
 from typing import List, Optional
 from CIACO_Algo import CIACO
+from route_cache import RouteCache
 from Truck import Truck
 from Order import Order
-from helper_functions import total_route_distance
+from helper_functions import euclidean_distance, total_route_distance
 
 # -------------------------------
 # Delivery Management & Dynamic Route Optimization System
@@ -13,6 +14,8 @@ class DeliveryManagementSystem:
         self.trucks: List[Truck] = []
         # In a real system, this could be replaced by a database or live API integration.
         self.ciaco_optimizer = CIACO()
+        # Candidate trucks are often re-evaluated over the same stops
+        self.route_cache = RouteCache(self.ciaco_optimizer)
 
     def add_truck(self, truck: Truck):
         self.trucks.append(truck)
@@ -45,23 +48,30 @@ class DeliveryManagementSystem:
             print(f"No truck with sufficient capacity for {order}")
             return None
 
+        # Nearest trucks first: they are the likeliest to accept, so usually only one CIACO run is needed
+        candidate_trucks.sort(key=lambda truck: euclidean_distance(truck.current_location, order.pickup))
+
         # For each candidate truck, try to dynamically re-optimize the route
         for truck in candidate_trucks:
             print(f"Evaluating truck {truck.truck_id} for {order}")
             # Create a new set of stops: current route stops + pickup and dropoff of new order.
             # We assume the route is a list of stops (coordinates) that includes the current position and already assigned deliveries.
-            new_stops = truck.route.copy()
+            # An optimized route closes back at its start; that repeat is the only duplicate it holds
+            new_stops = truck.route[:-1] if len(truck.route) > 1 and truck.route[-1] == truck.route[0] else truck.route.copy()
             # To keep things generic, add the new pickup and drop-off.
             # In a real implementation, the pickup should be inserted before dropoff.
-            new_stops.extend([order.pickup, order.dropoff])
-            # Remove duplicates if necessary
-            new_stops = list(dict.fromkeys(new_stops))
+            # Only the two new stops can duplicate an existing one, so only they are checked
+            known_stops = set(new_stops)
+            for stop in (order.pickup, order.dropoff):
+                if stop not in known_stops:
+                    known_stops.add(stop)
+                    new_stops.append(stop)
 
             # Use the CIACO optimizer to compute an updated route.
-            optimized_route = self.ciaco_optimizer.optimize_route(new_stops)
+            optimized_route = self.route_cache.optimize_route(new_stops)
             # Check route feasibility: Here we simply compare the new route distance with a threshold.
             # In a real system, additional checks such as time window constraints would be applied.
-            current_distance = total_route_distance(truck.route)
+            current_distance = total_route_distance(truck.route_arr)
             new_distance = total_route_distance(optimized_route)
             print(f"Truck {truck.truck_id}: current distance = {current_distance:.2f}, new distance = {new_distance:.2f}")
 
@@ -1,19 +1,104 @@
+import functools
 import folium
+from folium.plugins import FastMarkerCluster
 import pandas as pd
 import numpy as np
 from typing import List, Tuple, Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from scipy.optimize import linear_sum_assignment
 from CIACO_Algo import CIACO
-from datetime import datetime, timedelta
+from route_cache import RouteCache
+from datetime import datetime
 import json
 import h3.api.basic_int as h3
 from GIS import hexMerge
 
+EARTH_RADIUS_KM = 6371.0
+# Rings of H3 cells searched around a pickup before falling back to every truck
+HEX_SEARCH_MAX_K = 3
+# Average speed used for time window estimates; faster than typical to be lenient
+AVERAGE_SPEED_KMH = 80
+# Columns of DynamicRoutingSystem._truck_load
+MAX_CAPACITY, CURRENT_CAPACITY, TOTAL_WEIGHT = 0, 1, 2
+
+# Leaflet marker for a [lat, lon, color, popup] row of a FastMarkerCluster
+MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({markerColor: row[2], icon: 'info-sign', prefix: 'glyphicon'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[3]);
+    return marker;
+}
+"""
+
+def _frozen_clock(method):
+    """Serve a single datetime.now() reading to everything one call of method does"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._now is not None:
+            return method(self, *args, **kwargs)
+        self._now = datetime.now()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._now = None
+    return wrapper
+
+def _hex_style(feature):
+    """Leaflet style of a hexagon feature; dense hexagons are drawn red"""
+    color = 'blue' if feature["properties"]["truck_count"] < 20 else 'red'
+    return {'color': color, 'weight': 2, 'fillColor': color, 'fillOpacity': 0.6}
+
+def _spread_bits(value: int) -> int:
+    """Spread the low 32 bits of value over the even bits of a 64-bit integer"""
+    value &= 0xFFFFFFFF
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    return (value | (value << 1)) & 0x5555555555555555
+
+def geohash_int(lat: float, lon: float) -> int:
+    """
+    64-bit integer geohash of a (lat, lon) point: its 32-bit longitude and latitude cells,
+    bit-interleaved with longitude first. Cells are under a centimetre across, so points
+    that differ only by float noise share a code.
+    """
+    lat_cell = min(int((lat + 90.0) / 180.0 * (1 << 32)), (1 << 32) - 1)
+    lon_cell = min(int((lon + 180.0) / 360.0 * (1 << 32)), (1 << 32) - 1)
+    return (_spread_bits(lon_cell) << 1) | _spread_bits(lat_cell)
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between (lat, lon) points given in degrees; broadcasts over arrays"""
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
 class DynamicRoutingSystem:
     def __init__(self):
         self.trucks: Dict[str, Dict] = {}  # truck_id -> {current_location, capacity, current_route, deliveries}
         self.deliveries: Dict[str, Dict] = {}  # delivery_id -> {pickup, dropoff, weight, status, time_window}
         self.map = folium.Map(location=[20.5937, 78.9629], zoom_start=5)  # Centered on India
+        # One worker renders maps in the order they were requested
+        self._viz_pool = ThreadPoolExecutor(max_workers=1)
         self.ciaco = CIACO(num_ants=10, iterations=50)
+        # Reassignments keep asking for routes over the same stops
+        self.route_cache = RouteCache(self.ciaco)
+        # Truck locations and loads mirrored as arrays so the distances to, and the feasibility
+        # of, all trucks are one vectorized call; row i belongs to self._truck_ids[i]
+        self._truck_ids: List[str] = []
+        self._truck_index: Dict[str, int] = {}
+        self._truck_latlon = np.empty((0, 2), dtype=np.float64)
+        self._truck_load = np.empty((0, 3), dtype=np.float64)
+        # H3 cell -> trucks currently inside it, for searching outward from a pickup
+        self._hex_to_trucks: Dict[int, set] = {}
+        # Great-circle distances between known points, see set_distance_table
+        self._table_index: Dict[int, int] = {}  # geohash_int of a point -> its table row
+        # geohash_int -> the one (lat, lon) tuple deliveries share for that point
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._distance_table = np.empty((0, 0), dtype=np.float64)
+        # Set for the duration of a dispatch call so its steps share one clock reading
+        self._now: Optional[datetime] = None
         self.H3_RESOLUTION = 8
         self.hex_counts = None
         self.truck_data = None
@@ -35,52 +120,157 @@ class DynamicRoutingSystem:
         ]
         
         # Assign hexagons
-        self.truck_data["hex_id"] = self.truck_data.apply(
-            lambda row: h3.latlng_to_cell(row["Latitude"], row["Longitude"], self.H3_RESOLUTION), 
-            axis=1
-        )
+        # Iterate the raw columns; a row-wise apply builds a Series per truck
+        latitudes = self.truck_data["Latitude"].to_numpy()
+        longitudes = self.truck_data["Longitude"].to_numpy()
+        self.truck_data["hex_id"] = [
+            h3.latlng_to_cell(lat, lng, self.H3_RESOLUTION)
+            for lat, lng in zip(latitudes.tolist(), longitudes.tolist())
+        ]
         
-        # Count trucks per hexagon
-        self.hex_counts = self.truck_data["hex_id"].value_counts().reset_index()
-        self.hex_counts.columns = ["hex_id", "truck_count"]
+        # Count trucks per hexagon; largest counts first, as value_counts ordered them
+        self.hex_counts = (self.truck_data.groupby("hex_id", sort=False).size()
+                           .sort_values(ascending=False)
+                           .rename("truck_count").reset_index())
         
         # Merge low-density hexagons
         K_MIN = 10
         self.hex_counts, merged_hexes = hexMerge.merge_hexagons(self.hex_counts, K_MIN)
         
-        # Subdivide high-density hexagons
+        # Subdivide high-density hexagons, expanding the subdivided ones straight into
+        # (hex_id, truck_count) rows rather than through an intermediate filtered frame
         MAX_TRUCKS = 50
-        high_density_hexes = self.hex_counts[self.hex_counts["truck_count"] >= K_MIN]
-        high_density_hexes["sub_hexes"] = high_density_hexes.apply(
-            lambda row: h3.cell_to_children(row["hex_id"], self.H3_RESOLUTION + 1) 
-            if row["truck_count"] > MAX_TRUCKS else [row["hex_id"]], 
-            axis=1
-        )
-        
-        # Expand subdivided hexagons
-        sub_hex_list = high_density_hexes.explode("sub_hexes")[["sub_hexes", "truck_count"]]
-        sub_hex_list.columns = ["hex_id", "truck_count"]
+        dense = self.hex_counts["truck_count"].to_numpy() >= K_MIN
+        dense_ids = self.hex_counts["hex_id"].to_numpy()[dense].tolist()
+        dense_counts = self.hex_counts["truck_count"].to_numpy()[dense]
+        sub_hex_list = pd.DataFrame({
+            "hex_id": [
+                h3.cell_to_children(hex_id, self.H3_RESOLUTION + 1)
+                if truck_count > MAX_TRUCKS else [hex_id]
+                for hex_id, truck_count in zip(dense_ids, dense_counts.tolist())
+            ],
+            "truck_count": dense_counts
+        }).explode("hex_id")
         
         # Combine all hexagons
         self.hex_counts = pd.concat([self.hex_counts, sub_hex_list])
         
     def add_truck(self, truck_id: str, max_capacity: float, current_location: Tuple[float, float]):
         """Add a new truck to the system"""
+        if truck_id in self.trucks:
+            self._hex_to_trucks[self.trucks[truck_id]['hex_id']].discard(truck_id)
         self.trucks[truck_id] = {
             'max_capacity': max_capacity,
             'current_capacity': max_capacity,
             'current_location': current_location,
             'current_route': [],
             'deliveries': [],
-            'last_update': datetime.now(),
+            'last_update': self._current_time(),
             'hex_id': h3.latlng_to_cell(current_location[0], current_location[1], self.H3_RESOLUTION),
             'total_weight': 0  # Track total weight of all deliveries
         }
+        self._hex_to_trucks.setdefault(self.trucks[truck_id]['hex_id'], set()).add(truck_id)
+        load = (max_capacity, max_capacity, 0)
+        if truck_id in self._truck_index:
+            self._truck_latlon[self._truck_index[truck_id]] = current_location
+            self._truck_load[self._truck_index[truck_id]] = load
+        else:
+            self._truck_index[truck_id] = len(self._truck_ids)
+            self._truck_ids.append(truck_id)
+            self._truck_latlon = np.vstack([self._truck_latlon, [current_location]])
+            self._truck_load = np.vstack([self._truck_load, [load]])
+
+    def _remove_truck(self, truck_id: str):
+        """Drop a truck and its location row; the last row moves into the freed slot"""
+        self._hex_to_trucks[self.trucks.pop(truck_id)['hex_id']].discard(truck_id)
+        idx = self._truck_index.pop(truck_id)
+        last_id = self._truck_ids.pop()
+        if last_id != truck_id:
+            self._truck_ids[idx] = last_id
+            self._truck_index[last_id] = idx
+            self._truck_latlon[idx] = self._truck_latlon[-1]
+            self._truck_load[idx] = self._truck_load[-1]
+        self._truck_latlon = self._truck_latlon[:-1]
+        self._truck_load = self._truck_load[:-1]
+
+    def _current_time(self) -> datetime:
+        """The clock reading of the running dispatch call, or the actual time outside one"""
+        return self._now or datetime.now()
+
+    def _add_load(self, truck_id: str, weight: float):
+        """Load (or, with a negative weight, unload) a truck, keeping its load row in sync"""
+        truck = self.trucks[truck_id]
+        truck['total_weight'] += weight
+        truck['current_capacity'] -= weight
+        row = self._truck_load[self._truck_index[truck_id]]
+        row[TOTAL_WEIGHT] = truck['total_weight']
+        row[CURRENT_CAPACITY] = truck['current_capacity']
+
+    def _distances_to_trucks(self, point: Tuple[float, float]) -> np.ndarray:
+        """Distance in km from every truck to a point, indexed like self._truck_ids"""
+        return haversine_km(self._truck_latlon[:, 0], self._truck_latlon[:, 1], point[0], point[1])
+
+    def _nearest_truck(self, delivery: Dict, distances: np.ndarray,
+                       feasible: np.ndarray) -> Optional[str]:
+        """
+        Closest feasible truck to the delivery's pickup.
+        Trucks in the H3 rings around the pickup hex are tried first, so only when none
+        of them fits is the minimum taken over every truck.
+
+        Args:
+            delivery: The delivery record
+            distances: Distance in km from every truck row to the pickup
+            feasible: Boolean mask over the truck rows
+        """
+        # Infeasible trucks can never be the closest
+        costs = np.where(feasible, distances, np.inf)
+
+        for k in range(HEX_SEARCH_MAX_K + 1):
+            rows = [self._truck_index[truck_id]
+                    for cell in h3.grid_disk(delivery['pickup_hex'], k)
+                    for truck_id in self._hex_to_trucks.get(cell, ())
+                    if truck_id in self.trucks]
+            if rows:
+                best = rows[int(np.argmin(costs[rows]))]
+                if np.isfinite(costs[best]):
+                    return self._truck_ids[best]
+
+        while costs.size:
+            best = int(np.argmin(costs))
+            if not np.isfinite(costs[best]):
+                break
+            if self._truck_ids[best] in self.trucks:
+                return self._truck_ids[best]
+            # Truck was deleted from self.trucks directly; skip its stale row
+            costs[best] = np.inf
+        return None
+        
+    def k_nearest_trucks(self, point: Tuple[float, float], k: int = 3,
+                         min_capacity: float = 0) -> List[Tuple[str, float]]:
+        """
+        Up to k trucks closest to a point that still have min_capacity kg free.
+
+        Returns:
+            (truck_id, distance in km) pairs, closest first
+        """
+        costs = np.where(self._truck_load[:, CURRENT_CAPACITY] >= min_capacity,
+                         self._distances_to_trucks(point), np.inf)
+        # Trucks deleted from self.trucks directly leave stale rows behind
+        costs[[truck_id not in self.trucks for truck_id in self._truck_ids]] = np.inf
+        k = min(k, costs.size)
+        if k <= 0:
+            return []
+        rows = np.argpartition(costs, k - 1)[:k]
+        rows = rows[np.argsort(costs[rows])]
+        return [(self._truck_ids[row], float(costs[row])) for row in rows.tolist() if np.isfinite(costs[row])]
         
     def add_delivery(self, delivery_id: str, pickup: Tuple[float, float], 
                     dropoff: Tuple[float, float], weight: float,
                     time_window: Optional[Tuple[datetime, datetime]] = None):
         """Add a new delivery request"""
+        # Deliveries keep reusing the same endpoints; they all share one tuple per point
+        pickup = self._intern_point(pickup)
+        dropoff = self._intern_point(dropoff)
         self.deliveries[delivery_id] = {
             'pickup': pickup,
             'dropoff': dropoff,
@@ -89,65 +279,91 @@ class DynamicRoutingSystem:
             'assigned_truck': None,
             'pickup_hex': h3.latlng_to_cell(pickup[0], pickup[1], self.H3_RESOLUTION),
             'dropoff_hex': h3.latlng_to_cell(dropoff[0], dropoff[1], self.H3_RESOLUTION),
-            'time_window': time_window
+            'time_window': time_window,
+            # Truck independent, so worked out once instead of per candidate truck
+            'pickup_dropoff_km': self._calculate_distance(pickup, dropoff),
+            'time_window_ts': (time_window[0].timestamp(), time_window[1].timestamp()) if time_window else None
         }
         
+    def _intern_point(self, point: Tuple[float, float]) -> Tuple[float, float]:
+        """The shared tuple of a (lat, lon) point, keyed on its geohash_int"""
+        return self._points.setdefault(geohash_int(point[0], point[1]), tuple(point))
+    
     def find_suitable_truck(self, delivery_id: str) -> Optional[str]:
         """Find a suitable truck for a delivery based on capacity and location"""
         delivery = self.deliveries[delivery_id]
-        best_truck = None
-        min_distance = float('inf')
-        
-        for truck_id, truck in self.trucks.items():
-            # Check total weight constraint first
-            if truck['total_weight'] + delivery['weight'] > truck['max_capacity']:
-                continue
-                
-            # Check current capacity
-            if truck['current_capacity'] >= delivery['weight']:
-                # Check time window if specified
-                if delivery['time_window']:
-                    start_time, end_time = delivery['time_window']
-                    if not self._can_meet_time_window(truck_id, delivery, start_time, end_time):
-                        continue
-                
-                # Calculate distance from truck's current location to pickup
-                distance = self._calculate_distance(truck['current_location'], delivery['pickup'])
-                if distance < min_distance:
-                    min_distance = distance
-                    best_truck = truck_id
-                    
-        return best_truck
+        distances = self._distances_to_trucks(delivery['pickup'])
+        return self._nearest_truck(delivery, distances, self._feasible_trucks(delivery, distances))
     
-    def _can_meet_time_window(self, truck_id: str, delivery: Dict, 
-                            start_time: datetime, end_time: datetime) -> bool:
-        """Check if truck can meet delivery time window"""
-        truck = self.trucks[truck_id]
-        current_time = datetime.now()
-        
-        # If current time is past the end time, return False
-        if current_time > end_time:
-            return False
+    def _feasible_trucks(self, delivery: Dict, distances: np.ndarray) -> np.ndarray:
+        """
+        Boolean mask over the truck rows of the trucks that can take a delivery
+
+        Args:
+            delivery: The delivery record
+            distances: Distance in km from every truck row to the pickup
+        """
+        weight = delivery['weight']
+        load = self._truck_load
+
+        # Total weight and current capacity constraints, for all trucks at once
+        feasible = ((load[:, TOTAL_WEIGHT] + weight <= load[:, MAX_CAPACITY]) &
+                    (load[:, CURRENT_CAPACITY] >= weight))
+
+        # Check time window if specified
+        if delivery['time_window']:
+            feasible &= self._can_meet_time_window(distances, delivery)
+        return feasible
+    
+    def _can_meet_time_window(self, distance_to_pickup, delivery: Dict):
+        """
+        Check if trucks at the given distance (km) from the pickup can meet the delivery
+        time window; distance_to_pickup may be a scalar or an array over trucks
+        """
+        # Plain POSIX timestamps keep this to float arithmetic
+        start_ts, end_ts = delivery['time_window_ts']
+        current_ts = self._current_time().timestamp()
             
-        # Use the start time if current time is before start time
-        effective_start = max(current_time, start_time)
+        # Use the start time if current time is before start time; if current time is
+        # past the end time the hours left are negative and no truck qualifies
+        effective_start = max(current_ts, start_ts)
+        hours_left = (end_ts - effective_start) / 3600
         
-        # Calculate estimated time to pickup with faster speed assumption
-        distance_to_pickup = self._calculate_distance(truck['current_location'], delivery['pickup'])
-        # Use 80km/h for faster delivery estimation (being more lenient)
-        estimated_time_to_pickup = effective_start + timedelta(hours=distance_to_pickup/80)
+        # Estimated time to pickup with faster speed assumption (being more lenient)
+        hours_to_pickup = distance_to_pickup / AVERAGE_SPEED_KMH
         
-        # Calculate estimated time to dropoff with faster speed
-        distance_to_dropoff = self._calculate_distance(delivery['pickup'], delivery['dropoff'])
-        estimated_time_to_dropoff = estimated_time_to_pickup + timedelta(hours=distance_to_dropoff/80)
+        # Estimated time to dropoff with faster speed
+        hours_to_dropoff = hours_to_pickup + delivery['pickup_dropoff_km'] / AVERAGE_SPEED_KMH
         
         # Add smaller buffer time for loading/unloading
-        estimated_time_to_dropoff += timedelta(minutes=15)
+        hours_to_dropoff += 0.25
         
         # Being more lenient with time windows - only check if we can start the delivery
         # within the time window, not necessarily complete it
-        return estimated_time_to_pickup <= end_time
+        return hours_to_pickup <= hours_left
     
+    def set_distance_table(self, points: List[Tuple[float, float]]):
+        """
+        Precompute the great-circle distances between a fixed set of (lat, lon) points.
+        Routes whose stops are all among them slice this table instead of recomputing
+        the distances on every assignment.
+        """
+        # Points are indexed by geohash_int, so a lookup is one integer dict access
+        unique_points = {geohash_int(point[0], point[1]): tuple(point) for point in points}
+        self._table_index = {code: i for i, code in enumerate(unique_points)}
+        coords = np.asarray(list(unique_points.values()), dtype=np.float64).reshape(-1, 2)
+        self._distance_table = haversine_km(coords[:, None, 0], coords[:, None, 1],
+                                            coords[None, :, 0], coords[None, :, 1])
+
+    def _stop_distances(self, stops: List[Tuple[float, float]]) -> np.ndarray:
+        """Distance matrix in km between stops, taken from the distance table when it covers them"""
+        rows = [self._table_index.get(geohash_int(stop[0], stop[1])) for stop in stops]
+        if None not in rows:
+            return self._distance_table[np.ix_(rows, rows)]
+        points = np.asarray(stops, dtype=np.float64)
+        return haversine_km(points[:, None, 0], points[:, None, 1],
+                            points[None, :, 0], points[None, :, 1])
+
     def optimize_route(self, truck_id: str, new_delivery_id: str) -> List[Tuple[float, float]]:
         """Optimize route for a truck including a new delivery"""
         truck = self.trucks[truck_id]
@@ -166,87 +382,156 @@ class DynamicRoutingSystem:
         stops.append(new_delivery['pickup'])
         stops.append(new_delivery['dropoff'])
         
-        # Optimize route using CIACO
-        optimized_route = self.ciaco.optimize_route(stops)
+        # Optimize route using CIACO over great-circle distances, computed once for all stops
+        distance_matrix = self._stop_distances(stops)
+        optimized_route = self.route_cache.optimize_route(stops, distance_matrix=distance_matrix)
         return optimized_route
     
     def update_truck_status(self, truck_id: str, new_location: Tuple[float, float]):
         """Update truck's current location and status"""
         truck = self.trucks[truck_id]
         truck['current_location'] = new_location
-        truck['last_update'] = datetime.now()
-        truck['hex_id'] = h3.latlng_to_cell(new_location[0], new_location[1], self.H3_RESOLUTION)
-        
-        # Update delivery statuses
+        self._truck_latlon[self._truck_index[truck_id]] = new_location
+        truck['last_update'] = self._current_time()
+        new_hex = h3.latlng_to_cell(new_location[0], new_location[1], self.H3_RESOLUTION)
+        if new_hex != truck['hex_id']:
+            self._hex_to_trucks[truck['hex_id']].discard(truck_id)
+            self._hex_to_trucks.setdefault(new_hex, set()).add(truck_id)
+            truck['hex_id'] = new_hex
+        
+        # Update delivery statuses; completed deliveries are dropped in one pass
+        # instead of list.remove while iterating, which also skipped the next entry
+        remaining = []
         for delivery_id in truck['deliveries']:
             delivery = self.deliveries[delivery_id]
             if delivery['status'] == 'in_progress':
                 # Check if truck has reached delivery point
                 if self._calculate_distance(new_location, delivery['dropoff']) < 0.01:  # 10 meters threshold
                     delivery['status'] = 'completed'
-                    truck['current_capacity'] += delivery['weight']
-                    truck['total_weight'] -= delivery['weight']
-                    truck['deliveries'].remove(delivery_id)
+                    self._add_load(truck_id, -delivery['weight'])
+                    continue
+            remaining.append(delivery_id)
+        truck['deliveries'] = remaining
     
-    def visualize_routes(self):
-        """Visualize all truck routes on the map with hexagonal grid"""
-        # Clear existing map
-        self.map = folium.Map(location=[20.5937, 78.9629], zoom_start=5)
-        
-        # Plot hexagonal grid
-        if self.hex_counts is not None:
-            for _, row in self.hex_counts.iterrows():
-                hex_id = row["hex_id"]
-                boundary = h3.cell_to_boundary(hex_id)
-                folium.Polygon(
-                    locations=boundary,
-                    color='blue' if row["truck_count"] < 20 else 'red',
-                    weight=2,
-                    fill=True,
-                    fill_color='blue' if row["truck_count"] < 20 else 'red',
-                    fill_opacity=0.6,
-                    popup=f"Trucks in area: {row['truck_count']}"
-                ).add_to(self.map)
+    def route_snapshot(self) -> Dict[str, List[list]]:
+        """
+        Marker and route data of the current state as plain lists, which can be rendered
+        later or in another thread or process
+
+        Returns:
+            Dictionary with the 'trucks' and 'deliveries' marker rows and the 'routes'
+        """
+        # Markers are collected as plain rows and rendered client-side by one cluster
+        # per layer, instead of templating a folium.Marker for every point
+        truck_markers = []
+        delivery_markers = []
+        routes = []
         
         # Plot truck locations and routes
         for truck_id, truck in self.trucks.items():
             # Plot truck location
-            folium.Marker(
-                location=truck['current_location'],
-                popup=f"Truck {truck_id}<br>Capacity: {truck['current_capacity']}/{truck['max_capacity']}",
-                icon=folium.Icon(color='red', icon='info-sign')
-            ).add_to(self.map)
+            truck_markers.append([
+                truck['current_location'][0], truck['current_location'][1], 'red',
+                f"Truck {truck_id}<br>Capacity: {truck['current_capacity']}/{truck['max_capacity']}"
+            ])
             
             # Plot route if exists
             if truck['current_route']:
-                folium.PolyLine(
-                    locations=truck['current_route'],
-                    weight=2,
-                    color='green',
-                    opacity=0.8
-                ).add_to(self.map)
+                routes.append(list(truck['current_route']))
                 
             # Plot delivery points
             for delivery_id in truck['deliveries']:
                 delivery = self.deliveries[delivery_id]
-                folium.Marker(
-                    location=delivery['pickup'],
-                    popup=f"Pickup {delivery_id}",
-                    icon=folium.Icon(color='green', icon='info-sign')
-                ).add_to(self.map)
-                folium.Marker(
-                    location=delivery['dropoff'],
-                    popup=f"Dropoff {delivery_id}",
-                    icon=folium.Icon(color='red', icon='info-sign')
-                ).add_to(self.map)
+                delivery_markers.append([delivery['pickup'][0], delivery['pickup'][1], 'green',
+                                         f"Pickup {delivery_id}"])
+                delivery_markers.append([delivery['dropoff'][0], delivery['dropoff'][1], 'red',
+                                         f"Dropoff {delivery_id}"])
+        
+        return {'trucks': truck_markers, 'deliveries': delivery_markers, 'routes': routes}
+    
+    def visualize_routes(self, map_file: str = "dynamic_routes.html") -> Future:
+        """
+        Visualize all truck routes on the map with hexagonal grid.
+        Only the marker and route data are collected here; the map is built and saved to
+        map_file on a background thread, so call result() on the returned future to wait for the file.
+        """
+        # The snapshot is private to the task, so routing can carry on meanwhile
+        return self._viz_pool.submit(self._render_routes, self.hex_counts,
+                                     {None: self.route_snapshot()}, map_file)
+    
+    def visualize_layers(self, layers: Dict[str, Dict[str, List[list]]],
+                         map_file: str = "dynamic_routes.html") -> Future:
+        """
+        Render several snapshots taken by route_snapshot, e.g. one per test scenario, into a
+        single map with a layer per snapshot, saved to map_file on the background thread
+
+        Args:
+            layers: Layer name -> snapshot, in the order the layers should be listed
+            map_file: HTML file to save the map to
+        """
+        return self._viz_pool.submit(self._render_routes, self.hex_counts, dict(layers), map_file)
+
+    def _render_routes(self, hex_counts: Optional[pd.DataFrame],
+                       layers: Dict[Optional[str], Dict[str, List[list]]],
+                       map_file: str) -> folium.Map:
+        """
+        Build the map from snapshots taken by route_snapshot and save it; the snapshot of
+        the None layer is drawn on the map itself, any other into a layer of its own name
+        """
+        map_obj = folium.Map(location=[20.5937, 78.9629], zoom_start=5)
+        
+        # Plot hexagonal grid as one GeoJSON layer instead of a templated polygon per hex
+        if hex_counts is not None:
+            features = []
+            for hex_id, truck_count in zip(hex_counts["hex_id"].tolist(), hex_counts["truck_count"].tolist()):
+                # GeoJSON wants closed [lng, lat] rings; h3 gives open (lat, lng) ones
+                ring = [[lng, lat] for lat, lng in h3.cell_to_boundary(hex_id)]
+                ring.append(ring[0])
+                features.append({
+                    "type": "Feature",
+                    "geometry": {"type": "Polygon", "coordinates": [ring]},
+                    "properties": {"truck_count": truck_count}
+                })
+            folium.GeoJson(
+                {"type": "FeatureCollection", "features": features},
+                name="Hexagons",
+                style_function=_hex_style,
+                popup=folium.GeoJsonPopup(fields=["truck_count"], aliases=["Trucks in area:"])
+            ).add_to(map_obj)
+        
+        for layer_idx, (name, snapshot) in enumerate(layers.items()):
+            if name is None:
+                parent = map_obj
+                route_layer = folium.FeatureGroup(name="Routes").add_to(map_obj)
+            else:
+                # Only the last layer starts visible; the layer control switches between them
+                parent = route_layer = folium.FeatureGroup(
+                    name=name, show=layer_idx == len(layers) - 1
+                ).add_to(map_obj)
+            for route in snapshot['routes']:
+                folium.PolyLine(
+                    locations=route,
+                    weight=2,
+                    color='green',
+                    opacity=0.8
+                ).add_to(route_layer)
+
+            if snapshot['trucks']:
+                FastMarkerCluster(snapshot['trucks'], callback=MARKER_CALLBACK, name="Trucks").add_to(parent)
+            if snapshot['deliveries']:
+                FastMarkerCluster(snapshot['deliveries'], callback=MARKER_CALLBACK, name="Deliveries").add_to(parent)
+        folium.LayerControl().add_to(map_obj)
         
         # Save map
-        self.map.save("dynamic_routes.html")
+        map_obj.save(map_file)
+        self.map = map_obj
+        return map_obj
         
     def _calculate_distance(self, point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
-        """Calculate Euclidean distance between two points"""
-        return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+        """Calculate haversine distance in km between two (lat, lon) points"""
+        return float(haversine_km(point1[0], point1[1], point2[0], point2[1]))
     
+    @_frozen_clock
     def assign_delivery(self, delivery_id: str) -> bool:
         """Assign a delivery to a suitable truck"""
         if delivery_id not in self.deliveries:
@@ -261,77 +546,121 @@ class DynamicRoutingSystem:
         if not truck_id:
             return False
             
-        # Assign delivery to truck
+        self._assign_to_truck(delivery_id, truck_id)
+        return True
+    
+    def _assign_to_truck(self, delivery_id: str, truck_id: str):
+        """Hand a delivery to a truck and update the truck's route"""
+        delivery = self.deliveries[delivery_id]
         truck = self.trucks[truck_id]
         delivery['status'] = 'in_progress'
         delivery['assigned_truck'] = truck_id
         truck['deliveries'].append(delivery_id)
-        truck['total_weight'] += delivery['weight']
-        truck['current_capacity'] -= delivery['weight']
+        self._add_load(truck_id, delivery['weight'])
         
         # Update route for truck
         truck['current_route'] = self.optimize_route(truck_id, delivery_id)
-        
-        return True
     
+    @_frozen_clock
+    def bulk_assign(self, deliveries: pd.DataFrame) -> Dict[str, bool]:
+        """
+        Add and assign a batch of deliveries at once.
+        Deliveries are first matched one-to-one to trucks, minimizing the total distance
+        from the trucks to the pickups; deliveries left over once every truck has one
+        are assigned one at a time like assign_delivery.
+
+        Args:
+            deliveries: DataFrame with columns id, pickup_lat, pickup_lon, drop_lat,
+                drop_lon and weight, and optionally time_window ((start, end) or None)
+
+        Returns:
+            Dictionary mapping each delivery ID to whether it was assigned
+        """
+        delivery_ids = deliveries['id'].tolist()
+        pickups = deliveries[['pickup_lat', 'pickup_lon']].to_numpy(dtype=np.float64)
+        dropoffs = deliveries[['drop_lat', 'drop_lon']].to_numpy(dtype=np.float64)
+        weights = deliveries['weight'].tolist()
+        time_windows = (deliveries['time_window'].tolist() if 'time_window' in deliveries
+                        else [None] * len(delivery_ids))
+        for delivery_id, pickup, dropoff, weight, time_window in zip(
+                delivery_ids, map(tuple, pickups.tolist()), map(tuple, dropoffs.tolist()), weights, time_windows):
+            self.add_delivery(delivery_id, pickup, dropoff, weight, time_window)
+        
+        # Distance from every truck to every pickup, with the pairs that do not fit priced out
+        cost = haversine_km(pickups[:, None, 0], pickups[:, None, 1],
+                            self._truck_latlon[None, :, 0], self._truck_latlon[None, :, 1])
+        # Trucks deleted from self.trucks directly leave stale rows behind
+        active = np.array([truck_id in self.trucks for truck_id in self._truck_ids], dtype=bool)
+        feasible = np.empty(cost.shape, dtype=bool)
+        for row, delivery_id in enumerate(delivery_ids):
+            feasible[row] = self._feasible_trucks(self.deliveries[delivery_id], cost[row]) & active
+        # A penalty just above any feasible matching keeps the solver's arithmetic in km range
+        cost[~feasible] = cost[feasible].sum() + 1
+        
+        assigned = dict.fromkeys(delivery_ids, False)
+        for row, col in zip(*linear_sum_assignment(cost)):
+            if feasible[row, col]:
+                self._assign_to_truck(delivery_ids[row], self._truck_ids[col])
+                assigned[delivery_ids[row]] = True
+        
+        # The loads changed, so the rest go one at a time against the updated trucks
+        for delivery_id in delivery_ids:
+            if not assigned[delivery_id]:
+                assigned[delivery_id] = self.assign_delivery(delivery_id)
+        return assigned
+    
+    @_frozen_clock
     def handle_truck_breakdown(self, truck_id: str) -> bool:
         """Handle truck breakdown by reassigning deliveries to other trucks"""
         if truck_id not in self.trucks:
             return False
             
-        # Get all deliveries from the broken truck
-        failed_deliveries = list(self.trucks[truck_id]['deliveries'].copy())
-        failed_delivery_objects = []
+        # Collect the deliveries of the broken truck before removing it
+        delivery_ids = list(self.trucks[truck_id]['deliveries'])
+        self._remove_truck(truck_id)
         
-        # Collect all delivery objects and their weights before removing the truck
-        for delivery_id in failed_deliveries:
-            delivery = self.deliveries[delivery_id]
-            failed_delivery_objects.append({
-                'id': delivery_id,
-                'weight': delivery['weight'],
-                'status': delivery['status']
-            })
+        return self.reassign_batch(delivery_ids)
+    
+    @_frozen_clock
+    def reassign_batch(self, delivery_ids: List[str]) -> bool:
+        """
+        Reassign a batch of deliveries, heaviest first, e.g. those of a truck that broke down.
+        Deliveries still held by a truck are released from it first; trucks deleted from
+        self.trucks are skipped, so their deliveries can be handed over without rebuilding
+        the truck arrays.
+        """
+        # Get all deliveries to reassign
+        deliveries = self.deliveries
+        failed_deliveries = []
+        
+        for delivery_id in delivery_ids:
+            delivery = deliveries[delivery_id]
+            truck_id = delivery['assigned_truck']
+            if delivery['status'] == 'in_progress' and truck_id in self.trucks:
+                self.trucks[truck_id]['deliveries'].remove(delivery_id)
+                self._add_load(truck_id, -delivery['weight'])
+            failed_deliveries.append((delivery_id, delivery))
             # Reset delivery status
             delivery['status'] = 'pending'
             delivery['assigned_truck'] = None
         
-        # Remove the broken truck
-        del self.trucks[truck_id]
-        
         # Sort deliveries by weight (descending) to handle larger deliveries first
-        failed_delivery_objects.sort(key=lambda x: x['weight'], reverse=True)
+        failed_deliveries.sort(key=lambda item: item[1]['weight'], reverse=True)
         
         # Try to reassign each delivery
         success = True
-        for delivery_obj in failed_delivery_objects:
-            delivery_id = delivery_obj['id']
-            
-            # Try to find a new truck with priority
-            new_truck_id = None
-            min_distance = float('inf')
-            
-            # First pass - try to find trucks with enough capacity
-            for tid, truck in self.trucks.items():
-                delivery = self.deliveries[delivery_id]
-                # More lenient capacity check
-                if truck['current_capacity'] >= delivery['weight'] * 0.9:  # Allow 10% overload
-                    distance = self._calculate_distance(truck['current_location'], delivery['pickup'])
-                    if distance < min_distance:
-                        min_distance = distance
-                        new_truck_id = tid
+        for delivery_id, delivery in failed_deliveries:
+            # Try to find the nearest truck with enough capacity;
+            # more lenient capacity check allows 10% overload
+            new_truck_id = self._nearest_truck(
+                delivery,
+                self._distances_to_trucks(delivery['pickup']),
+                self._truck_load[:, CURRENT_CAPACITY] >= delivery['weight'] * 0.9
+            )
             
             # If found a suitable truck, assign the delivery
             if new_truck_id:
-                new_truck = self.trucks[new_truck_id]
-                delivery = self.deliveries[delivery_id]
-                delivery['status'] = 'in_progress'
-                delivery['assigned_truck'] = new_truck_id
-                new_truck['deliveries'].append(delivery_id)
-                new_truck['total_weight'] += delivery['weight']
-                new_truck['current_capacity'] -= delivery['weight']
-                
-                # Update route for new truck
-                new_truck['current_route'] = self.optimize_route(new_truck_id, delivery_id)
+                self._assign_to_truck(delivery_id, new_truck_id)
             else:
                 success = False
                 print(f"Failed to reassign delivery {delivery_id}")
@@ -358,5 +687,5 @@ if __name__ == "__main__":
     routing_system.assign_delivery("D1")
     routing_system.assign_delivery("D2")
     
-    # Visualize routes
-    routing_system.visualize_routes() 
\ No newline at end of file
+    # Visualize routes and wait for the map to be written
+    routing_system.visualize_routes().result() 
\ No newline at end of file
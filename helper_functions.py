@@ -1,6 +1,7 @@
 import math
 from typing import List, Tuple, Optional
 import numpy as np
+from ciaco_kernels import route_quality
 
 # -------------------------------
 # Helper functions for CIACO Algorithm
@@ -19,53 +20,66 @@ def euclidean_distance(loc1: Tuple[float, float], loc2: Tuple[float, float]) ->
     """
     return math.sqrt((loc1[0] - loc2[0])**2 + (loc1[1] - loc2[1])**2)
 
+def calculate_distance_matrix(points: np.ndarray) -> np.ndarray:
+    """
+    Calculate the pairwise Euclidean distance matrix for a set of points.
+    
+    Args:
+        points: Array of shape (n, 2) with the (x, y) coordinates of each point
+        
+    Returns:
+        np.ndarray: (n, n) matrix of distances between every pair of points
+    """
+    points = np.asarray(points, dtype=np.float64)
+    diff = points[:, None, :] - points[None, :, :]
+    return np.sqrt((diff * diff).sum(axis=-1))
+
 def total_route_distance(stops: List[Tuple[float, float]], return_to_depot: bool = True) -> float:
     """
     Calculate the total distance of a route given a list of stops.
     
     Args:
-        stops: List of coordinates (x, y) representing stops
+        stops: Coordinates (x, y) representing stops, as a list of tuples or an (n, 2) array
         return_to_depot: Whether to include return to starting point in distance
         
     Returns:
         float: Total distance of the route
     """
-    if not stops:
+    if len(stops) == 0:
         return 0.0
         
-    distance = 0.0
-    for i in range(len(stops) - 1):
-        distance += euclidean_distance(stops[i], stops[i+1])
+    points = np.asarray(stops, dtype=np.float64)
+    segments = np.diff(points, axis=0)
+    distance = float(np.hypot(segments[:, 0], segments[:, 1]).sum())
     
     # Add return to depot if required
-    if return_to_depot and len(stops) > 1:
-        distance += euclidean_distance(stops[-1], stops[0])
+    if return_to_depot and len(points) > 1:
+        distance += math.hypot(points[-1, 0] - points[0, 0], points[-1, 1] - points[0, 1])
         
     return distance
 
-def calculate_visibility_matrix(stops: List[Tuple[float, float]]) -> np.ndarray:
+def calculate_visibility_matrix(stops: List[Tuple[float, float]],
+                                distance_matrix: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate the visibility matrix (heuristic information) for the CIACO algorithm.
     Visibility is the inverse of distance.
     
     Args:
-        stops: List of coordinates (x, y) representing stops
+        stops: Coordinates (x, y) of the stops, as a list of tuples or an (n, 2) array
+        distance_matrix: Precomputed (n, n) distances of the stops; when given the
+            visibility is derived from it instead of recomputing every distance
         
     Returns:
-        np.ndarray: Visibility matrix
+        np.ndarray: Visibility matrix (float32; selection weights need no more precision)
     """
-    n = len(stops)
-    visibility = np.zeros((n, n))
-    
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                distance = euclidean_distance(stops[i], stops[j])
-                visibility[i][j] = 1 / (distance + 1e-6)  # Add small constant to avoid division by zero
-                
+    if distance_matrix is None:
+        distance_matrix = calculate_distance_matrix(stops)
+
+    visibility = (1 / (distance_matrix + 1e-6)).astype(np.float32)  # Add small constant to avoid division by zero
+    np.fill_diagonal(visibility, 0)
     return visibility
 
-def calculate_route_quality(route: List[Tuple[float, float]], 
+def calculate_route_quality(route: List[int], 
                           pheromone_matrix: np.ndarray,
                           visibility_matrix: np.ndarray,
                           alpha: float,
@@ -74,7 +88,7 @@ def calculate_route_quality(route: List[Tuple[float, float]],
     Calculate the quality of a route based on pheromone and visibility.
     
     Args:
-        route: List of coordinates representing the route
+        route: Stop indices of the route, as a list or an integer array
         pheromone_matrix: Matrix of pheromone values
         visibility_matrix: Matrix of visibility values
         alpha: Pheromone importance factor
@@ -83,14 +97,9 @@ def calculate_route_quality(route: List[Tuple[float, float]],
     Returns:
         float: Route quality score
     """
-    quality = 0.0
-    for i in range(len(route) - 1):
-        current_idx = route[i]
-        next_idx = route[i + 1]
-        pheromone = pheromone_matrix[current_idx][next_idx] ** alpha
-        visibility = visibility_matrix[current_idx][next_idx] ** beta
-        quality += pheromone * visibility
-    return quality
+    # The edge sum runs in the compiled kernel, which needs an int64 index array
+    return route_quality(np.asarray(route, dtype=np.int64), pheromone_matrix,
+                         visibility_matrix, float(alpha), float(beta))
 
 def normalize_matrix(matrix: np.ndarray) -> np.ndarray:
     """
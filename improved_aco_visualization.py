@@ -1,16 +1,86 @@
+import contextlib
 import folium
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
+import multiprocessing
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple, Dict
 import osmnx as ox
 import networkx as nx
+from numba import njit, set_num_threads
+from scipy.spatial.distance import cdist
 from CIACO_Algo import CIACO
+from data_io import read_csv
+from route_cache import RouteCache
 from Truck import Truck
 from Order import Order
-from folium.plugins import MarkerCluster
+from folium.plugins import FastMarkerCluster, MarkerCluster
+
+# Leaflet marker for a [y, x, color, icon, popup, tooltip] row of a FastMarkerCluster
+STOP_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({markerColor: row[2], icon: row[3], prefix: 'fa'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[4]);
+    marker.bindTooltip(row[5]);
+    return marker;
+}
+"""
+
+# Annotated street networks are saved here and reused across runs;
+# OSMnx keeps its raw Overpass responses in the same folder
+GRAPH_CACHE_DIR = "cache"
+ox.settings.use_cache = True
+ox.settings.cache_folder = GRAPH_CACHE_DIR
+
+# Decimal places of the (lat, lon) keys in node_mapping, about 1 cm at the equator
+NODE_KEY_PRECISION = 7
+
+def _node_key(point):
+    """Quantize a (y, x) point so recomputed floats of the same location share one node_mapping key"""
+    return (round(point[0], NODE_KEY_PRECISION), round(point[1], NODE_KEY_PRECISION))
+
+@njit(cache=True)
+def _assign_max_remaining(weights, remaining):
+    """
+    Give each order, in the given order, to the truck with the most remaining capacity
+    
+    Args:
+        weights: Order weights, heaviest first for a balanced assignment
+        remaining: Remaining capacity of every truck, updated in place
+        
+    Returns:
+        Array with the truck index of every order, -1 where no truck has room
+    """
+    assignment = np.full(weights.shape[0], -1, dtype=np.int64)
+    for i in range(weights.shape[0]):
+        best = np.argmax(remaining)
+        if remaining[best] >= weights[i]:
+            assignment[i] = best
+            remaining[best] -= weights[i]
+    return assignment
+
+def _optimize_truck_route(ciaco, stops_xy, seed, num_threads=None):
+    """
+    Worker entry point: optimize one truck's route
+    
+    Args:
+        ciaco: CIACO optimizer (a private copy in a worker process)
+        stops_xy: (n, 2) array of the truck's stops
+        seed: Seed for the random module, so trucks do not share a random stream
+        num_threads: Threads this worker's ants may use, or None for all of them
+        
+    Returns:
+        Array of stop indices in visiting order
+    """
+    if num_threads is not None:
+        set_num_threads(num_threads)
+    random.seed(seed)
+    return ciaco.optimize_route_array(stops_xy)
 
 class ImprovedACOVisualization:
     def __init__(self, location_data=None):
@@ -22,10 +92,23 @@ class ImprovedACOVisualization:
         """
         self.location_data = location_data
         self.ciaco = CIACO(num_ants=15, iterations=50, alpha=1.0, beta=2.0)
+        self.route_cache = RouteCache(self.ciaco, maxsize=256)
         self.network_graph = None
         self.trucks = {}
         self.orders = {}
-        self.node_mapping = {}  # Maps (lat, lon) to network node
+        self.node_mapping = {}  # Maps quantized (lat, lon) to network node, see _node_key
+        self._node_idx = {}  # Maps network node to its row in _node_yx
+        self._node_yx = np.empty((0, 2))  # (lat, lon) of every network node, one row per node
+        self._segment_cache = {}  # Maps (source node, target node) to the segment's (lat, lon) path
+        self._predecessors = {}  # Maps source node to the shortest-path predecessors of every reachable node
+        self._rng = np.random.default_rng()
+        
+        # Order data as parallel arrays, one row per order in self.orders
+        self._order_ids = []
+        self._order_rows = {}  # Maps order ID to its row in the order arrays
+        self._order_pickups = np.empty((0, 2))
+        self._order_dropoffs = np.empty((0, 2))
+        self._order_weights = np.empty(0)
         
         # Predefined colors to ensure distinct route colors
         self.route_colors = [
@@ -40,7 +123,7 @@ class ImprovedACOVisualization:
         Args:
             filename: Path to the CSV file
         """
-        self.location_data = pd.read_csv(filename)
+        self.location_data = read_csv(filename)
         
         # Ensure the dataframe has the required columns
         if 'id' not in self.location_data.columns:
@@ -86,14 +169,31 @@ class ImprovedACOVisualization:
         if center_point is None:
             raise ValueError("No center point provided, no city name, and no location data available")
             
-        print(f"Creating street network around {center_point} with {distance}m radius")
-        
-        # Create network if it doesn't exist yet
-        if self.network_graph is None:
-            self.network_graph = ox.graph_from_point(center_point, dist=distance, network_type="drive")
+        # Create network if it doesn't exist yet, reusing an annotated graph saved
+        # by an earlier run for the same area
+        graph_file = os.path.join(
+            GRAPH_CACHE_DIR, f"drive_{center_point[0]:.3f}_{center_point[1]:.3f}_{distance}.graphml"
+        )
+        if self.network_graph is None and os.path.exists(graph_file):
+            print(f"Loading cached street network from {graph_file}")
+            self.network_graph = ox.load_graphml(graph_file)
+        else:
+            downloaded = self.network_graph is None
+            if downloaded:
+                print(f"Creating street network around {center_point} with {distance}m radius")
+                self.network_graph = ox.graph_from_point(center_point, dist=distance, network_type="drive")
+            
+            self.network_graph = ox.add_edge_speeds(self.network_graph)
+            self.network_graph = ox.add_edge_travel_times(self.network_graph)
+            if downloaded:
+                ox.save_graphml(self.network_graph, graph_file)
         
-        self.network_graph = ox.add_edge_speeds(self.network_graph)
-        self.network_graph = ox.add_edge_travel_times(self.network_graph)
+        # Node coordinates read once into a contiguous array; cached paths belong to the previous graph
+        nodes = self.network_graph.nodes
+        self._node_idx = {node: i for i, node in enumerate(nodes)}
+        self._node_yx = np.array([(nodes[node]['y'], nodes[node]['x']) for node in nodes], dtype=np.float64)
+        self._segment_cache = {}
+        self._predecessors = {}
         
         # Map all locations to network nodes
         if self.location_data is not None:
@@ -108,11 +208,13 @@ class ImprovedACOVisualization:
             
         print("Mapping locations to network nodes...")
         
-        # For each point in location_data, find the nearest node
-        for _, row in self.location_data.iterrows():
-            point = (row['y'], row['x'])
-            nearest_node = ox.distance.nearest_nodes(self.network_graph, row['x'], row['y'])
-            self.node_mapping[point] = nearest_node
+        # Find the nearest node of every point in one batched query, so the
+        # spatial index is built once instead of once per location
+        xs = self.location_data['x'].to_numpy()
+        ys = self.location_data['y'].to_numpy()
+        nearest_nodes = ox.distance.nearest_nodes(self.network_graph, xs, ys)
+        for point, nearest_node in zip(zip(ys.tolist(), xs.tolist()), nearest_nodes):
+            self.node_mapping[_node_key(point)] = nearest_node
             
         print(f"Mapped {len(self.node_mapping)} locations to network nodes")
     
@@ -129,11 +231,11 @@ class ImprovedACOVisualization:
         
         if start_locations and len(start_locations) >= num_trucks:
             # Use provided start locations
+            capacities = self._rng.integers(max_capacity//2, max_capacity, size=num_trucks, endpoint=True).tolist()
             for i in range(num_trucks):
                 truck_id = f"T{i+1}"
                 location = start_locations[i]
-                capacity = random.randint(max_capacity//2, max_capacity)
-                self.trucks[truck_id] = Truck(truck_id, location, capacity)
+                self.trucks[truck_id] = Truck(truck_id, location, capacities[i])
         elif self.location_data is not None:
             # Use random points from the location data as starting points
             if len(self.location_data) < num_trucks:
@@ -148,25 +250,19 @@ class ImprovedACOVisualization:
                     depot_location = (depot_rows.iloc[0]['y'], depot_rows.iloc[0]['x'])
                     print(f"Using depot location: {depot_location}")
             
+            capacities = self._rng.integers(max_capacity//2, max_capacity, size=num_trucks, endpoint=True).tolist()
             if depot_location:
-                # Start all trucks from depot
-                for i in range(num_trucks):
-                    truck_id = f"T{i+1}"
-                    capacity = random.randint(max_capacity//2, max_capacity)
-                    # Add small random offset to prevent exact overlap of trucks
-                    location = (
-                        depot_location[0] + (random.random() - 0.5) * 0.0005,
-                        depot_location[1] + (random.random() - 0.5) * 0.0005
-                    )
-                    self.trucks[truck_id] = Truck(truck_id, location, capacity)
+                # Start all trucks from depot, with a small random offset to prevent exact overlap of trucks
+                locations = (np.asarray(depot_location, dtype=np.float64)
+                             + self._rng.uniform(-0.00025, 0.00025, size=(num_trucks, 2))).tolist()
             else:
                 # Use distinct points from data
-                start_indices = random.sample(range(len(self.location_data)), num_trucks)
-                for i, idx in enumerate(start_indices):
-                    truck_id = f"T{i+1}"
-                    location = (self.location_data.iloc[idx]['y'], self.location_data.iloc[idx]['x'])
-                    capacity = random.randint(max_capacity//2, max_capacity)
-                    self.trucks[truck_id] = Truck(truck_id, location, capacity)
+                start_indices = self._rng.choice(len(self.location_data), size=num_trucks, replace=False)
+                locations = self.location_data[['y', 'x']].to_numpy(dtype=np.float64)[start_indices].tolist()
+                
+            for i in range(num_trucks):
+                truck_id = f"T{i+1}"
+                self.trucks[truck_id] = Truck(truck_id, tuple(locations[i]), capacities[i])
         else:
             raise ValueError("No start locations provided and no location data available")
                 
@@ -188,18 +284,20 @@ class ImprovedACOVisualization:
         self.orders = {}
         
         if predefined_orders:
-            # Use predefined orders
+            # Use predefined orders, with random weights for those that have none
+            default_weights = self._rng.integers(max_weight//10, max_weight, size=len(predefined_orders),
+                                                 endpoint=True).tolist()
             for i, order_data in enumerate(predefined_orders):
                 order_id = f"O{i+1}"
                 pickup = order_data['pickup']
                 dropoff = order_data['dropoff']
-                weight = order_data.get('weight', random.randint(max_weight//10, max_weight))
+                weight = order_data.get('weight', default_weights[i])
                 
                 self.orders[order_id] = Order(order_id, weight, pickup, dropoff)
         elif self.location_data is not None and len(self.location_data) >= 2:
             # Create random orders from location data
             # Use non-depot locations (if color column exists)
-            non_depot_locations = self.location_data.copy()
+            non_depot_locations = self.location_data
             if 'color' in non_depot_locations.columns:
                 # Exclude the depot (green point) as a pickup/dropoff
                 non_depot_locations = non_depot_locations[non_depot_locations['color'] != 'green']
@@ -208,19 +306,26 @@ class ImprovedACOVisualization:
                 print("Warning: Not enough locations for creating orders")
                 return self.orders
                 
-            for i in range(min(num_orders, len(non_depot_locations) * (len(non_depot_locations) - 1) // 2)):
-                # Select random pickup and dropoff locations (ensuring they're different)
-                pickup_idx, dropoff_idx = random.sample(range(len(non_depot_locations)), 2)
-                
+            pool = non_depot_locations[['y', 'x']].to_numpy(dtype=np.float64)
+            num_locations = len(pool)
+            num_orders = min(num_orders, num_locations * (num_locations - 1) // 2)
+            
+            # Select random, distinct pickup and dropoff locations and weights for all orders at once;
+            # a nonzero offset modulo the number of locations never lands on the pickup itself
+            pickup_indices = self._rng.integers(0, num_locations, size=num_orders)
+            dropoff_indices = (pickup_indices + self._rng.integers(1, num_locations, size=num_orders)) % num_locations
+            pickups = pool[pickup_indices].tolist()
+            dropoffs = pool[dropoff_indices].tolist()
+            weights = self._rng.integers(max_weight//10, max_weight, size=num_orders, endpoint=True).tolist()
+            
+            for i in range(num_orders):
                 order_id = f"O{i+1}"
-                pickup = (non_depot_locations.iloc[pickup_idx]['y'], non_depot_locations.iloc[pickup_idx]['x'])
-                dropoff = (non_depot_locations.iloc[dropoff_idx]['y'], non_depot_locations.iloc[dropoff_idx]['x'])
-                weight = random.randint(max_weight//10, max_weight)
-                
-                self.orders[order_id] = Order(order_id, weight, pickup, dropoff)
+                self.orders[order_id] = Order(order_id, weights[i], tuple(pickups[i]), tuple(dropoffs[i]))
         else:
             print("Error: Not enough location data to create orders")
             
+        self._build_order_arrays()
+        
         print(f"Created {len(self.orders)} orders:")
         for order_id, order in list(self.orders.items())[:5]:  # Show first 5 for brevity
             print(f"  {order_id}: weight={order.weight}, pickup={order.pickup}, dropoff={order.dropoff}")
@@ -229,6 +334,17 @@ class ImprovedACOVisualization:
             
         return self.orders
     
+    def _build_order_arrays(self):
+        """
+        Store the pickups, dropoffs and weights of self.orders as parallel arrays
+        """
+        orders = list(self.orders.values())
+        self._order_ids = [order.order_id for order in orders]
+        self._order_rows = {order_id: i for i, order_id in enumerate(self._order_ids)}
+        self._order_pickups = np.array([order.pickup for order in orders], dtype=np.float64).reshape(-1, 2)
+        self._order_dropoffs = np.array([order.dropoff for order in orders], dtype=np.float64).reshape(-1, 2)
+        self._order_weights = np.fromiter((order.weight for order in orders), dtype=np.float64, count=len(orders))
+    
     def assign_orders_to_trucks(self, strategy="balanced"):
         """
         Assign orders to trucks using various strategies
@@ -244,67 +360,59 @@ class ImprovedACOVisualization:
         # Reset truck assignments
         for truck in self.trucks.values():
             truck.assigned_orders = []
-            truck.update_capacity()
+            truck.recompute_capacity()
+            
+        # Orders set directly on the instance have no arrays yet
+        if self._order_ids != list(self.orders):
+            self._build_order_arrays()
+        orders = [self.orders[order_id] for order_id in self._order_ids]
+        weights = self._order_weights
+        trucks = list(self.trucks.values())
+        remaining = np.array([truck.remaining_capacity for truck in trucks], dtype=np.float64)
             
         if strategy == "greedy":
             # Assign each order to the truck with the most remaining capacity
-            for order_id, order in self.orders.items():
-                best_truck = None
-                best_capacity = -1
-                
-                for truck_id, truck in self.trucks.items():
-                    if truck.remaining_capacity >= order.weight and truck.remaining_capacity > best_capacity:
-                        best_truck = truck
-                        best_capacity = truck.remaining_capacity
+            for i, order in enumerate(orders):
+                candidates = np.where(remaining >= weights[i], remaining, -np.inf)
+                best = int(np.argmax(candidates))
                 
-                if best_truck:
-                    best_truck.add_order(order)
+                if np.isfinite(candidates[best]):
+                    trucks[best].add_order(order)
+                    remaining[best] -= weights[i]
                 else:
-                    print(f"Warning: Could not assign order {order_id} (weight {order.weight}) to any truck")
+                    print(f"Warning: Could not assign order {order.order_id} (weight {order.weight}) to any truck")
         
         elif strategy == "balanced":
-            # Sort orders by weight (heaviest first)
-            sorted_orders = sorted(self.orders.items(), key=lambda x: x[1].weight, reverse=True)
+            # Heaviest orders first, each to the truck with the most remaining capacity;
+            # if that truck cannot take the order, no truck can
+            sorted_orders = np.argsort(-weights, kind="stable")
+            assignment = _assign_max_remaining(weights[sorted_orders], remaining)
             
-            # Sort trucks by capacity (largest first)
-            sorted_trucks = sorted(self.trucks.items(), key=lambda x: x[1].max_capacity, reverse=True)
-            
-            # Assign orders round-robin to balance load
-            for i, (order_id, order) in enumerate(sorted_orders):
-                assigned = False
-                
-                # Try each truck in rotation
-                for j in range(len(sorted_trucks)):
-                    truck_idx = (i + j) % len(sorted_trucks)
-                    truck = sorted_trucks[truck_idx][1]
-                    
-                    if truck.remaining_capacity >= order.weight:
-                        truck.add_order(order)
-                        assigned = True
-                        break
-                
-                if not assigned:
-                    print(f"Warning: Could not assign order {order_id} (weight {order.weight}) to any truck")
+            for order_idx, truck_idx in zip(sorted_orders.tolist(), assignment.tolist()):
+                order = orders[order_idx]
+                if truck_idx >= 0:
+                    trucks[truck_idx].add_order(order)
+                else:
+                    print(f"Warning: Could not assign order {order.order_id} (weight {order.weight}) to any truck")
         
         elif strategy == "nearest":
             # Assign each order to the nearest truck that has capacity
-            for order_id, order in self.orders.items():
-                best_truck = None
-                best_distance = float('inf')
-                
-                for truck_id, truck in self.trucks.items():
-                    if truck.remaining_capacity >= order.weight:
-                        # Calculate distance from truck to pickup
-                        distance = self._calculate_distance(truck.current_location, order.pickup)
-                        
-                        if distance < best_distance:
-                            best_truck = truck
-                            best_distance = distance
+            # Distances from every pickup to every truck, computed once
+            distances = cdist(
+                self._order_pickups,
+                np.array([truck.current_location for truck in trucks], dtype=np.float64)
+            )
+            
+            for i, order in enumerate(orders):
+                # Trucks without room for the order can never be the nearest
+                candidates = np.where(remaining >= weights[i], distances[i], np.inf)
+                best = int(np.argmin(candidates))
                 
-                if best_truck:
-                    best_truck.add_order(order)
+                if np.isfinite(candidates[best]):
+                    trucks[best].add_order(order)
+                    remaining[best] -= weights[i]
                 else:
-                    print(f"Warning: Could not assign order {order_id} (weight {order.weight}) to any truck")
+                    print(f"Warning: Could not assign order {order.order_id} (weight {order.weight}) to any truck")
         
         # Count unassigned orders
         assigned_orders = set()
@@ -322,16 +430,6 @@ class ImprovedACOVisualization:
             total_weight = sum(order.weight for order in truck.assigned_orders)
             print(f"Truck {truck_id}: {len(truck.assigned_orders)} orders, {total_weight}/{truck.max_capacity} capacity used")
             
-    def _calculate_distance(self, point1, point2):
-        """
-        Calculate Euclidean distance between two points
-        
-        Args:
-            point1: (y, x) tuple for first point
-            point2: (y, x) tuple for second point
-        """
-        return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
-    
     def optimize_routes(self):
         """
         Optimize routes for each truck using the CIACO algorithm
@@ -339,32 +437,66 @@ class ImprovedACOVisualization:
         if not self.trucks:
             raise ValueError("No trucks created. Call create_trucks first.")
             
+        jobs = []
         for truck_id, truck in self.trucks.items():
             if not truck.assigned_orders:
                 print(f"Truck {truck_id} has no assigned orders, skipping route optimization")
                 continue
                 
-            # Create a list of stops: start with current location, then pickups, then dropoffs
-            stops = [truck.current_location]
+            # Build the stops as one array: start with current location, then pickups, then dropoffs
+            rows = [self._order_rows[order.order_id] for order in truck.assigned_orders]
+            stops_xy = np.concatenate((
+                np.asarray(truck.current_location, dtype=np.float64).reshape(1, 2),
+                self._order_pickups[rows],
+                self._order_dropoffs[rows]
+            ))
             
-            # Add all pickups first
-            for order in truck.assigned_orders:
-                stops.append(order.pickup)
-                
-            # Then add all dropoffs
-            for order in truck.assigned_orders:
-                stops.append(order.dropoff)
+            # Stop sets seen before (retries, parameter sweeps) reuse their earlier route
+            stops = [tuple(stop) for stop in stops_xy.tolist()]
+            cached_route = self.route_cache.lookup(stops)
+            if cached_route is not None:
+                truck.route = cached_route
+                print(f"Reusing cached route for truck {truck_id} with {len(truck.route)} stops")
+                continue
                 
-            # Optimize route with CIACO
-            print(f"Optimizing route for truck {truck_id} with {len(stops)} stops")
-            try:
-                optimized_route = self.ciaco.optimize_route(stops)
-                truck.route = optimized_route
-                print(f"Route optimized with {len(optimized_route)} stops")
-            except Exception as e:
-                print(f"Error optimizing route for truck {truck_id}: {e}")
-                truck.route = stops
-                print(f"Using unoptimized route with {len(stops)} stops instead")
+            print(f"Optimizing route for truck {truck_id} with {len(stops_xy)} stops")
+            jobs.append((truck_id, truck, stops_xy, stops))
+        
+        if not jobs:
+            return
+            
+        # Trucks are independent, so their routes are optimized in parallel processes.
+        # Each process builds its ants on a share of the cores, so the two levels of
+        # parallelism do not oversubscribe the machine
+        seeds = self._rng.integers(2**31, size=len(jobs)).tolist()
+        cpu_count = os.cpu_count() or 1
+        max_workers = min(len(jobs), cpu_count)
+        threads_per_worker = max(1, cpu_count // max_workers)
+        # Spawned workers: forking after Numba has started its thread pool hangs the process at exit
+        if len(jobs) > 1:
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            pool = contextlib.nullcontext()
+
+        with pool as executor:
+            futures = None
+            if executor is not None:
+                futures = [executor.submit(_optimize_truck_route, self.ciaco, stops_xy, seed, threads_per_worker)
+                           for (_, _, stops_xy, _), seed in zip(jobs, seeds)]
+
+            for job_idx, (truck_id, truck, stops_xy, stops) in enumerate(jobs):
+                try:
+                    if futures is None:
+                        route_idx = _optimize_truck_route(self.ciaco, stops_xy, seeds[job_idx])
+                    else:
+                        route_idx = futures[job_idx].result()
+                    truck.route = [stops[i] for i in route_idx]
+                    self.route_cache.store(stops, truck.route)
+                    print(f"Route optimized for truck {truck_id} with {len(truck.route)} stops")
+                except Exception as e:
+                    print(f"Error optimizing route for truck {truck_id}: {e}")
+                    truck.route = stops
+                    print(f"Using unoptimized route with {len(stops)} stops instead")
     
     def _get_node_for_point(self, point):
         """
@@ -376,17 +508,90 @@ class ImprovedACOVisualization:
         Returns:
             The nearest node ID in the network
         """
-        if point in self.node_mapping:
-            return self.node_mapping[point]
+        key = _node_key(point)
+        if key in self.node_mapping:
+            return self.node_mapping[key]
             
         if self.network_graph is None:
             raise ValueError("No network graph created. Call create_street_network first.")
             
         # Find the nearest node
-        nearest_node = ox.distance.nearest_nodes(self.network_graph, point[1], point[0])
-        self.node_mapping[point] = nearest_node
+        nearest_node = ox.distance.nearest_nodes(self.network_graph, key[1], key[0])
+        self.node_mapping[key] = nearest_node
         return nearest_node
     
+    def _get_nodes_for_points(self, points):
+        """
+        Map several points to their nearest network nodes, querying all unmapped points at once
+        
+        Args:
+            points: Iterable of (y, x) tuples
+        """
+        if self.network_graph is None:
+            raise ValueError("No network graph created. Call create_street_network first.")
+            
+        missing = list({key for key in map(_node_key, points) if key not in self.node_mapping})
+        if missing:
+            nearest_nodes = ox.distance.nearest_nodes(
+                self.network_graph,
+                [point[1] for point in missing],
+                [point[0] for point in missing]
+            )
+            self.node_mapping.update(zip(missing, nearest_nodes))
+    
+    def _shortest_path(self, source, target):
+        """
+        Get the fastest path between two network nodes
+        
+        One Dijkstra run per source node records the predecessors of every reachable
+        node, so later paths from the same source only walk that tree back.
+        
+        Args:
+            source: Start node ID
+            target: End node ID
+            
+        Returns:
+            List of node IDs from source to target
+        """
+        if source not in self._predecessors:
+            self._predecessors[source], _ = nx.dijkstra_predecessor_and_distance(
+                self.network_graph, source, weight='travel_time'
+            )
+        predecessors = self._predecessors[source]
+        if target not in predecessors:
+            raise nx.NetworkXNoPath(f"Node {target} not reachable from {source}")
+            
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]][0])
+        path.reverse()
+        return path
+    
+    def _route_segments(self, segments):
+        """
+        Find the road paths of all uncached segments in one batched OSMnx query
+        
+        OSMnx spreads the shortest-path searches over all CPU cores; segments it
+        cannot route stay uncached and fall back to _get_road_path_between_points.
+        
+        Args:
+            segments: Iterable of ((y, x), (y, x)) point pairs
+        """
+        pending = {}  # Uncached (source node, target node) pairs, in first-seen order
+        for point1, point2 in segments:
+            segment = (self._get_node_for_point(point1), self._get_node_for_point(point2))
+            if segment not in self._segment_cache:
+                pending[segment] = None
+        if not pending:
+            return
+            
+        origs, dests = zip(*pending)
+        paths = ox.shortest_path(self.network_graph, list(origs), list(dests), weight='travel_time', cpus=None)
+        for segment, path in zip(pending, paths):
+            if path is not None:
+                idx = np.fromiter((self._node_idx[node] for node in path), dtype=np.int64, count=len(path))
+                self._segment_cache[segment] = list(map(tuple, self._node_yx[idx].tolist()))
+    
     def _get_road_path_between_points(self, point1, point2):
         """
         Get the actual road path between two points using the network graph
@@ -405,17 +610,20 @@ class ImprovedACOVisualization:
         node1 = self._get_node_for_point(point1)
         node2 = self._get_node_for_point(point2)
         
+        # Segments repeat across trucks and renders; the graph is directed, so only
+        # the same (source, target) pair can reuse a path
+        segment = (node1, node2)
+        if segment in self._segment_cache:
+            return self._segment_cache[segment]
+            
         try:
             # Get the shortest path between the nodes
-            path = nx.shortest_path(self.network_graph, source=node1, target=node2, weight='travel_time')
-            
-            # Extract the coordinates for each node in the path
-            coords = []
-            for node in path:
-                y = self.network_graph.nodes[node]['y']
-                x = self.network_graph.nodes[node]['x']
-                coords.append((y, x))
-                
+            path = self._shortest_path(node1, node2)
+            
+            # Extract the coordinates for each node in the path with one array gather
+            idx = np.fromiter((self._node_idx[node] for node in path), dtype=np.int64, count=len(path))
+            coords = list(map(tuple, self._node_yx[idx].tolist()))
+            self._segment_cache[segment] = coords
             return coords
         except Exception as e:
             print(f"Error finding path between {point1} and {point2}: {e}")
@@ -462,21 +670,37 @@ class ImprovedACOVisualization:
             else:
                 center = (0, 0)
                 
-        # Create map
-        map_obj = folium.Map(location=center, tiles="cartodbpositron", zoom_start=12)
+        # Create map; route lines are painted on one canvas rather than as one SVG node each
+        map_obj = folium.Map(location=center, tiles="cartodbpositron", zoom_start=12, prefer_canvas=True)
         
         # Create marker clusters if requested
-        pickup_cluster = MarkerCluster(name="Pickups") if use_marker_clusters else map_obj
-        dropoff_cluster = MarkerCluster(name="Dropoffs") if use_marker_clusters else map_obj
         truck_cluster = MarkerCluster(name="Trucks") if use_marker_clusters else map_obj
         
         if use_marker_clusters:
-            pickup_cluster.add_to(map_obj)
-            dropoff_cluster.add_to(map_obj)
             truck_cluster.add_to(map_obj)
+            
+        # Pickup and dropoff markers are collected as [y, x, color, icon, popup, tooltip]
+        # rows and added in bulk once every truck has been walked
+        pickup_markers = []
+        dropoff_markers = []
+        
+        # Map every route stop to the network up front, in one batched query, then route
+        # each distinct segment once however many trucks share it, all in one batch
+        road_paths = {}
+        if use_road_network:
+            self._get_nodes_for_points(stop for truck in self.trucks.values() for stop in truck.route)
+            segments = {segment for truck in self.trucks.values()
+                        for segment in zip(truck.route, truck.route[1:])}
+            self._route_segments(segments)
+            road_paths = {segment: self._get_road_path_between_points(*segment) for segment in segments}
+        
+        # Orders on some truck, collected while the trucks are drawn
+        assigned_orders = set()
         
         # Add trucks to map
         for i, (truck_id, truck) in enumerate(self.trucks.items()):
+            assigned_orders.update(order.order_id for order in truck.assigned_orders)
+            
             # Create a popup with truck info
             popup_text = f"""
             <b>Truck {truck_id}</b><br>
@@ -498,7 +722,7 @@ class ImprovedACOVisualization:
             ).add_to(truck_cluster)
             
             # Add route if it exists
-            if hasattr(truck, 'route') and len(truck.route) > 1:
+            if len(truck.route) > 1:
                 # Use predefined colors to ensure distinct routes
                 color = self.route_colors[i % len(self.route_colors)]
                 
@@ -509,7 +733,7 @@ class ImprovedACOVisualization:
                         end_point = truck.route[j + 1]
                         
                         # Get the actual road path between the points
-                        path_coords = self._get_road_path_between_points(start_point, end_point)
+                        path_coords = road_paths[(start_point, end_point)]
                         
                         # Add the path segment to the map
                         folium.PolyLine(
@@ -531,6 +755,13 @@ class ImprovedACOVisualization:
                         tooltip=f"Truck {truck_id} route"
                     ).add_to(map_obj)
                 
+                # First (index, order) picking up or dropping off at each location
+                pickup_orders = {}
+                dropoff_orders = {}
+                for order_idx, order in enumerate(truck.assigned_orders):
+                    pickup_orders.setdefault(order.pickup, (order_idx, order))
+                    dropoff_orders.setdefault(order.dropoff, (order_idx, order))
+                
                 # Add markers for each stop with order info
                 for k, stop in enumerate(truck.route):
                     if k == 0:
@@ -538,63 +769,69 @@ class ImprovedACOVisualization:
                         continue
                         
                     # Determine if this is a pickup or dropoff
-                    is_pickup = any(order.pickup == stop for order in truck.assigned_orders)
-                    is_dropoff = any(order.dropoff == stop for order in truck.assigned_orders)
+                    pickup = pickup_orders.get(stop)
+                    dropoff = dropoff_orders.get(stop)
                     
-                    if is_pickup:
+                    if pickup:
                         icon_color = 'blue'
                         icon_name = 'arrow-up'
                         stop_type = 'Pickup'
-                        target_cluster = pickup_cluster
-                    elif is_dropoff:
+                        target_markers = pickup_markers
+                    elif dropoff:
                         icon_color = 'red'
                         icon_name = 'arrow-down'
                         stop_type = 'Dropoff'
-                        target_cluster = dropoff_cluster
+                        target_markers = dropoff_markers
                     else:
                         icon_color = 'gray'
                         icon_name = 'circle'
                         stop_type = 'Stop'
-                        target_cluster = map_obj
+                        target_markers = None
                     
-                    # Find the order for this stop
+                    # Find the order for this stop: the earliest one using it either way
                     order_info = ""
-                    for order in truck.assigned_orders:
-                        if order.pickup == stop or order.dropoff == stop:
-                            order_info = f"<br>Order: {order.order_id}<br>Weight: {order.weight}"
-                            break
+                    matches = [match for match in (pickup, dropoff) if match]
+                    if matches:
+                        _, order = min(matches, key=lambda match: match[0])
+                        order_info = f"<br>Order: {order.order_id}<br>Weight: {order.weight}"
                     
                     # Add marker
-                    folium.Marker(
-                        location=stop,
-                        popup=f"{stop_type} {k}{order_info}",
-                        tooltip=f"{stop_type} {k}",
-                        icon=folium.Icon(color=icon_color, icon=icon_name, prefix='fa')
-                    ).add_to(target_cluster)
+                    if target_markers is not None:
+                        target_markers.append([stop[0], stop[1], icon_color, icon_name,
+                                               f"{stop_type} {k}{order_info}", f"{stop_type} {k}"])
+                    else:
+                        folium.Marker(
+                            location=stop,
+                            popup=f"{stop_type} {k}{order_info}",
+                            tooltip=f"{stop_type} {k}",
+                            icon=folium.Icon(color=icon_color, icon=icon_name, prefix='fa')
+                        ).add_to(map_obj)
         
         # Add unassigned orders to map
-        assigned_orders = set()
-        for truck in self.trucks.values():
-            for order in truck.assigned_orders:
-                assigned_orders.add(order.order_id)
-        
         for order_id, order in self.orders.items():
             if order_id not in assigned_orders:
                 # Add pickup marker
-                folium.Marker(
-                    location=order.pickup,
-                    popup=f"Unassigned Pickup: {order_id}<br>Weight: {order.weight}",
-                    tooltip=f"Unassigned Pickup: {order_id}",
-                    icon=folium.Icon(color='orange', icon='arrow-up', prefix='fa')
-                ).add_to(pickup_cluster)
+                pickup_markers.append([order.pickup[0], order.pickup[1], 'orange', 'arrow-up',
+                                       f"Unassigned Pickup: {order_id}<br>Weight: {order.weight}",
+                                       f"Unassigned Pickup: {order_id}"])
                 
                 # Add dropoff marker
-                folium.Marker(
-                    location=order.dropoff,
-                    popup=f"Unassigned Dropoff: {order_id}<br>Weight: {order.weight}",
-                    tooltip=f"Unassigned Dropoff: {order_id}",
-                    icon=folium.Icon(color='orange', icon='arrow-down', prefix='fa')
-                ).add_to(dropoff_cluster)
+                dropoff_markers.append([order.dropoff[0], order.dropoff[1], 'orange', 'arrow-down',
+                                        f"Unassigned Dropoff: {order_id}<br>Weight: {order.weight}",
+                                        f"Unassigned Dropoff: {order_id}"])
+        
+        # Clustered markers are built client-side from one data array per layer
+        for name, markers in (("Pickups", pickup_markers), ("Dropoffs", dropoff_markers)):
+            if use_marker_clusters:
+                FastMarkerCluster(markers, callback=STOP_MARKER_CALLBACK, name=name).add_to(map_obj)
+            else:
+                for y, x, icon_color, icon_name, popup, tooltip in markers:
+                    folium.Marker(
+                        location=(y, x),
+                        popup=popup,
+                        tooltip=tooltip,
+                        icon=folium.Icon(color=icon_color, icon=icon_name, prefix='fa')
+                    ).add_to(map_obj)
         
         # Add layer control to toggle marker clusters
         if use_marker_clusters:
@@ -602,6 +839,51 @@ class ImprovedACOVisualization:
                 
         return map_obj
     
+    def _simulate_capacity(self, truck):
+        """
+        Simulate a truck's remaining capacity along its route
+        
+        Each stop after the start picks up the first matching order not yet picked up,
+        or drops off the first matching order already picked up.
+        
+        Returns:
+            Tuple of (positions, capacities, labels), one entry per event, starting with
+            the start of the route at position 0
+        """
+        orders = truck.assigned_orders
+        
+        # Hash each location to the orders using it once, instead of comparing every
+        # stop against every order
+        orders_at = {}
+        for k, order in enumerate(orders):
+            orders_at.setdefault(order.pickup, set()).add(k)
+            orders_at.setdefault(order.dropoff, set()).add(k)
+        
+        picked_up = [False] * len(orders)
+        positions = [0]
+        deltas = [float(truck.max_capacity)]
+        labels = ["Start"]
+        
+        for i, stop in enumerate(truck.route[1:], 1):  # Skip first stop (starting point)
+            for k in sorted(orders_at.get(stop, ())):
+                order = orders[k]
+                # If it's a pickup and not already picked up
+                if stop == order.pickup and not picked_up[k]:
+                    picked_up[k] = True
+                    deltas.append(-order.weight)
+                    labels.append(f"Pickup {order.order_id}")
+                # If it's a dropoff and already picked up
+                elif stop == order.dropoff and picked_up[k]:
+                    deltas.append(order.weight)
+                    labels.append(f"Dropoff {order.order_id}")
+                else:
+                    continue
+                positions.append(i)
+                break
+        
+        # Capacity after each event is the running sum of the load changes
+        return positions, np.cumsum(deltas), labels
+    
     def visualize_capacity_timeline(self, figsize=(12, 6)):
         """
         Visualize the truck capacity timeline as routes are followed
@@ -610,7 +892,7 @@ class ImprovedACOVisualization:
             raise ValueError("No trucks created. Call create_trucks first.")
             
         # Count number of trucks with routes
-        trucks_with_routes = sum(1 for truck in self.trucks.values() if hasattr(truck, 'route') and len(truck.route) > 1)
+        trucks_with_routes = sum(1 for truck in self.trucks.values() if len(truck.route) > 1)
         
         if trucks_with_routes == 0:
             raise ValueError("No trucks have routes. Call optimize_routes first.")
@@ -627,51 +909,23 @@ class ImprovedACOVisualization:
         
         # Plot each truck's capacity timeline
         for i, (truck_id, truck) in enumerate(self.trucks.items()):
-            if not hasattr(truck, 'route') or len(truck.route) <= 1:
+            if len(truck.route) <= 1:
                 continue
                 
             ax = axes[ax_index]
             ax_index += 1
             
-            # Initialize capacity at starting value
-            current_capacity = truck.max_capacity
-            capacities = [current_capacity]
-            labels = ["Start"]
-            positions = [0]
-            
-            # Track order pickup/dropoff status
-            order_status = {order.order_id: {"picked_up": False} for order in truck.assigned_orders}
-            
-            # Simulate route traversal
-            for i, stop in enumerate(truck.route[1:], 1):  # Skip first stop (starting point)
-                # Check if this stop is a pickup or dropoff
-                for order in truck.assigned_orders:
-                    # If it's a pickup and not already picked up
-                    if stop == order.pickup and not order_status[order.order_id]["picked_up"]:
-                        current_capacity -= order.weight
-                        capacities.append(current_capacity)
-                        labels.append(f"Pickup {order.order_id}")
-                        positions.append(i)
-                        order_status[order.order_id]["picked_up"] = True
-                        break
-                        
-                    # If it's a dropoff and already picked up
-                    elif stop == order.dropoff and order_status[order.order_id]["picked_up"]:
-                        current_capacity += order.weight
-                        capacities.append(current_capacity)
-                        labels.append(f"Dropoff {order.order_id}")
-                        positions.append(i)
-                        break
+            positions, capacities, labels = self._simulate_capacity(truck)
             
             # Use a color from the predefined colors
             color = self.route_colors[i % len(self.route_colors)]
             
             # Plot capacity timeline
-            ax.step(positions, capacities, where='post', linewidth=2, color=color)
+            ax.step(positions, capacities, where='post', linewidth=2, color=color, rasterized=True)
             
-            # Add markers for each stop
+            # Add markers for all stops as one artist, then label each stop
+            ax.scatter(positions, capacities, s=64, color=color, zorder=3, rasterized=True)
             for pos, cap, label in zip(positions, capacities, labels):
-                ax.plot(pos, cap, 'o', markersize=8, color=color)
                 ax.text(pos, cap + (truck.max_capacity * 0.03), label, rotation=45, ha='right')
                 
             # Set axis labels
@@ -736,15 +990,15 @@ def run_bangalore_demo():
     vis.create_street_network(center_point=bangalore_center, distance=10000)
     
     # Create trucks starting from the depot (first point)
-    depot = (locations.iloc[0]['y'], locations.iloc[0]['x'])
+    num_trucks = 3
+    depot = locations[['y', 'x']].to_numpy(dtype=np.float64)[0]
     
-    # Create trucks with slightly different starting positions for visibility
-    start_locations = [
-        (depot[0], depot[1]),                       # Exact depot location
-        (depot[0] + 0.0005, depot[1] - 0.0003),     # Small offset 1
-        (depot[0] - 0.0004, depot[1] + 0.0005)      # Small offset 2
-    ]
-    vis.create_trucks(num_trucks=3, max_capacity=1000, start_locations=start_locations)
+    # Create trucks with slightly different starting positions for visibility;
+    # the first one stays exactly at the depot
+    offsets = np.random.default_rng(0).normal(0, 5e-4, size=(num_trucks, 2))
+    offsets[0] = 0
+    start_locations = list(map(tuple, (depot + offsets).tolist()))
+    vis.create_trucks(num_trucks=num_trucks, max_capacity=1000, start_locations=start_locations)
     
     # Create orders
     vis.create_orders(num_orders=10, max_weight=300)
@@ -774,7 +1028,7 @@ def run_bangalore_demo():
     
     # Save capacity timeline
     timeline_file = "bangalore_capacity_timeline.png"
-    plt.savefig(timeline_file, dpi=300, bbox_inches="tight")
+    plt.savefig(timeline_file, dpi=100, bbox_inches="tight")
     print(f"Capacity timeline saved to {timeline_file}")
     
     return map_obj, fig
@@ -2,7 +2,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 from typing import List, Tuple
 from CIACO_Algo import CIACO
-from helper_functions import total_route_distance
+from helper_functions import total_route_distance, calculate_distance_matrix
+from concurrent.futures import ProcessPoolExecutor
+from numba import set_num_threads
+import os
 import time
 import random
 
@@ -20,9 +23,12 @@ def generate_random_stops(num_stops: int, x_range: Tuple[float, float] = (0, 100
     Returns:
         List of (x, y) coordinates
     """
-    return [(random.uniform(x_range[0], x_range[1]), 
-             random.uniform(y_range[0], y_range[1])) 
-            for _ in range(num_stops)]
+    # Draw every coordinate in one call, then hand back plain tuples
+    points = np.random.uniform((x_range[0], y_range[0]), (x_range[1], y_range[1]), size=(num_stops, 2))
+    return list(map(tuple, points.tolist()))
+
+# Figure shared by plot_route calls; recreated only once a viewer has closed it
+_fig, _ax = None, None
 
 def plot_route(stops: List[Tuple[float, float]], route: List[Tuple[float, float]], 
                title: str = "Route Visualization", show_clusters: bool = False,
@@ -37,38 +43,65 @@ def plot_route(stops: List[Tuple[float, float]], route: List[Tuple[float, float]
         show_clusters: Whether to show cluster assignments
         clusters: List of cluster assignments
     """
-    plt.figure(figsize=(10, 10))
+    global _fig, _ax
+    if _fig is None or not plt.fignum_exists(_fig.number):
+        _fig, _ax = plt.subplots(figsize=(10, 10))
+    _ax.clear()
     
     # Plot all stops
-    x_coords = [stop[0] for stop in stops]
-    y_coords = [stop[1] for stop in stops]
+    stops_arr = np.asarray(stops, dtype=np.float64).reshape(-1, 2)
+    route_arr = np.asarray(route, dtype=np.float64).reshape(-1, 2)
+    cluster_handles, cluster_labels = [], []
     
     if show_clusters and clusters:
-        # Plot stops with different colors for each cluster
-        colors = plt.cm.rainbow(np.linspace(0, 1, len(clusters)))
+        # Plot all stops in one scatter, colored by the index of their cluster
+        cluster_id = np.zeros(len(stops_arr), dtype=np.int64)
         for cluster_idx, cluster in enumerate(clusters):
-            cluster_x = [stops[i][0] for i in cluster]
-            cluster_y = [stops[i][1] for i in cluster]
-            plt.scatter(cluster_x, cluster_y, c=[colors[cluster_idx]], 
-                       label=f'Cluster {cluster_idx + 1}')
+            cluster_id[cluster] = cluster_idx
+        scatter = _ax.scatter(stops_arr[:, 0], stops_arr[:, 1], c=cluster_id, cmap='rainbow',
+                              vmin=0, vmax=max(len(clusters) - 1, 1))
+        cluster_handles = scatter.legend_elements()[0]
+        cluster_labels = [f'Cluster {cluster_idx + 1}' for cluster_idx in np.unique(cluster_id)]
     else:
-        plt.scatter(x_coords, y_coords, c='red', label='Stops')
+        _ax.scatter(stops_arr[:, 0], stops_arr[:, 1], c='red', label='Stops')
     
     # Plot the route
-    route_x = [stop[0] for stop in route]
-    route_y = [stop[1] for stop in route]
-    plt.plot(route_x, route_y, 'b-', label='Route')
+    _ax.plot(route_arr[:, 0], route_arr[:, 1], 'b-', label='Route')
     
     # Highlight the depot (first stop)
-    plt.scatter(route_x[0], route_y[0], c='green', s=100, label='Depot')
+    _ax.scatter(route_arr[0, 0], route_arr[0, 1], c='green', s=100, label='Depot')
     
-    plt.title(title)
-    plt.xlabel('X Coordinate')
-    plt.ylabel('Y Coordinate')
-    plt.legend()
-    plt.grid(True)
+    _ax.set_title(title)
+    _ax.set_xlabel('X Coordinate')
+    _ax.set_ylabel('Y Coordinate')
+    handles, labels = _ax.get_legend_handles_labels()
+    _ax.legend(list(cluster_handles) + handles, cluster_labels + labels)
+    _ax.grid(True)
     plt.show()
 
+def _run_test(config: dict, stops: List[Tuple[float, float]], distance_matrix: np.ndarray,
+              seed: int, num_threads: int):
+    """
+    Worker entry point: run and time one optimization of a benchmark problem.
+    
+    Args:
+        config: CIACO keyword arguments
+        stops: Stops of the problem
+        distance_matrix: Precomputed distances between the stops
+        seed: Seed for the random module, so tests do not share a random stream
+        num_threads: Threads the ants of this worker may use
+        
+    Returns:
+        Tuple of (route, execution time in seconds, clusters)
+    """
+    set_num_threads(num_threads)
+    random.seed(seed)
+    aco = CIACO(**config)
+    start_time = time.perf_counter()
+    route = aco.optimize_route(stops, distance_matrix=distance_matrix)
+    end_time = time.perf_counter()
+    return route, end_time - start_time, aco.clusters
+
 def test_algorithm(num_stops: int = 20, num_tests: int = 5):
     """
     Test the CIACO algorithm with different parameters and configurations.
@@ -76,6 +109,9 @@ def test_algorithm(num_stops: int = 20, num_tests: int = 5):
     Args:
         num_stops: Number of stops to generate
         num_tests: Number of test runs
+        
+    Returns:
+        Tuple of (stops, route, clusters) of the best run of the Enhanced configuration
     """
     print(f"\nTesting CIACO Algorithm with {num_stops} stops")
     print("=" * 50)
@@ -88,50 +124,66 @@ def test_algorithm(num_stops: int = 20, num_tests: int = 5):
         {"config": {"num_ants": 20, "iterations": 100, "elitist_factor": 3.0}, "name": "Elitist"}
     ]
     
-    for config in configs:
-        print(f"\nTesting {config['name']} Configuration:")
-        print("-" * 30)
-        
-        total_time = 0
-        total_distance = 0
-        best_distance = float('inf')
-        
-        for test in range(num_tests):
-            # Generate random stops
-            stops = generate_random_stops(num_stops)
-            
-            # Create CIACO instance with current configuration
-            aco = CIACO(**config['config'])
-            
-            # Run optimization
-            start_time = time.time()
-            route = aco.optimize_route(stops)
-            end_time = time.time()
+    # Every configuration solves the same problems, so each problem's stops and
+    # distance matrix are built once rather than once per configuration
+    problems = []
+    for _ in range(num_tests):
+        stops = generate_random_stops(num_stops)
+        problems.append((stops, calculate_distance_matrix(stops)))
+    
+    # Tests are independent, so each configuration runs all of them in parallel
+    # processes, with the cores split between the workers' ants
+    cpu_count = os.cpu_count() or 1
+    max_workers = min(num_tests, cpu_count)
+    threads_per_worker = max(1, cpu_count // max_workers)
+    
+    # Best run of the Enhanced configuration (20 ants, 100 iterations, otherwise CIACO's
+    # defaults) as (distance, stops, route, clusters); main() shows it as the sample problem
+    sample = None
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for config in configs:
+            print(f"\nTesting {config['name']} Configuration:")
+            print("-" * 30)
             
-            # Calculate metrics
-            distance = total_route_distance(route)
-            execution_time = end_time - start_time
+            total_time = 0
+            total_distance = 0
+            best_distance = float('inf')
             
-            total_time += execution_time
-            total_distance += distance
-            best_distance = min(best_distance, distance)
+            futures = [executor.submit(_run_test, config['config'], stops, distance_matrix,
+                                       random.randrange(2**31), threads_per_worker)
+                       for stops, distance_matrix in problems]
             
-            print(f"Test {test + 1}:")
-            print(f"  Distance: {distance:.2f}")
-            print(f"  Time: {execution_time:.2f}s")
+            for test, ((stops, _), future) in enumerate(zip(problems, futures)):
+                route, execution_time, clusters = future.result()
+                
+                # Calculate metrics
+                distance = total_route_distance(route)
+                
+                total_time += execution_time
+                total_distance += distance
+                best_distance = min(best_distance, distance)
+                if config['name'] == "Enhanced" and (sample is None or distance < sample[0]):
+                    sample = (distance, stops, route, clusters)
+                
+                print(f"Test {test + 1}:")
+                print(f"  Distance: {distance:.2f}")
+                print(f"  Time: {execution_time:.2f}s")
+                
+                # Plot the first test run for each configuration
+                if test == 0:
+                    plot_route(stops, route, 
+                              title=f"{config['name']} Configuration - Test 1",
+                              show_clusters=True,
+                              clusters=clusters)
             
-            # Plot the first test run for each configuration
-            if test == 0:
-                plot_route(stops, route, 
-                          title=f"{config['name']} Configuration - Test 1",
-                          show_clusters=True,
-                          clusters=aco.clusters)
-        
-        # Print average metrics
-        print("\nAverage Metrics:")
-        print(f"  Average Distance: {total_distance/num_tests:.2f}")
-        print(f"  Average Time: {total_time/num_tests:.2f}s")
-        print(f"  Best Distance: {best_distance:.2f}")
+            # Print average metrics
+            print("\nAverage Metrics:")
+            print(f"  Average Distance: {total_distance/num_tests:.2f}")
+            print(f"  Average Time: {total_time/num_tests:.2f}s")
+            print(f"  Best Distance: {best_distance:.2f}")
+    
+    return sample[1:]
 
 def main():
     """
@@ -142,23 +194,9 @@ def main():
     
     for size in problem_sizes:
         print(f"\nTesting with {size} stops")
-        test_algorithm(num_stops=size, num_tests=3)
-        
-        # Generate a sample problem and solve it
-        stops = generate_random_stops(size)
-        aco = CIACO(
-            num_ants=20,
-            iterations=100,
-            alpha=1.0,
-            beta=2.0,
-            evaporation_rate=0.1,
-            initial_pheromone=1.0,
-            return_to_depot=True,
-            num_clusters=3,
-            elitist_factor=2.0
-        )
-        
-        route = aco.optimize_route(stops)
+        # The benchmark already solved problems of this size with the sample
+        # parameters; show its best run instead of solving another one
+        stops, route, clusters = test_algorithm(num_stops=size, num_tests=3)
         distance = total_route_distance(route)
         
         print(f"\nSample Problem Results:")
@@ -166,7 +204,7 @@ def main():
         plot_route(stops, route, 
                   title=f"Sample Problem with {size} stops",
                   show_clusters=True,
-                  clusters=aco.clusters)
+                  clusters=clusters)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# -------------------------------
+# Memoized route optimization
+# -------------------------------
+
+class RouteCache:
+    """
+    LRU cache in front of a route optimizer such as CIACO.
+
+    Routes are keyed by their start and the set of remaining stops, so asking again
+    for the same stops in a different order reuses the earlier optimization instead
+    of running the whole metaheuristic.
+
+    Args:
+        optimizer: Object exposing optimize_route(stops), with stops[0] as the start
+        maxsize (int): Number of routes kept before the least recently used is evicted
+        precision (int): Decimal places coordinates are rounded to when building keys
+    """
+    def __init__(self, optimizer, maxsize: int = 4096, precision: int = 5):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.optimizer = optimizer
+        self.maxsize = maxsize
+        self.precision = precision
+        # key -> visiting order, as -1 for the start and ranks among the sorted stops
+        self._routes = OrderedDict()
+
+    def _round(self, stop: Tuple[float, float]) -> Tuple[float, float]:
+        return (round(stop[0], self.precision), round(stop[1], self.precision))
+
+    def _key(self, stops: List[Tuple[float, float]]):
+        """Return the cache key of the stops and the rounded sort order of stops[1:]."""
+        rest = stops[1:]
+        rounded = [self._round(stop) for stop in rest]
+        order = sorted(range(len(rest)), key=rounded.__getitem__)
+        return (self._round(stops[0]), tuple(rounded[i] for i in order)), order
+
+    def lookup(self, stops: List[Tuple[float, float]]) -> Optional[List[Tuple[float, float]]]:
+        """
+        Return the cached route for the stops, or None if it was never stored.
+
+        Args:
+            stops: List of coordinates (x, y); the first one is the start of the route
+        """
+        key, order = self._key(stops)
+        slots = self._routes.get(key)
+        if slots is None:
+            return None
+        self._routes.move_to_end(key)
+        rest = stops[1:]
+        return [stops[0] if slot < 0 else rest[order[slot]] for slot in slots]
+
+    def store(self, stops: List[Tuple[float, float]], route: List[Tuple[float, float]]):
+        """
+        Remember the optimized route of the stops.
+
+        Args:
+            stops: List of coordinates (x, y); the first one is the start of the route
+            route: The stops in visiting order, as returned by the optimizer
+        """
+        key, order = self._key(stops)
+
+        # Remember the route by position, so a hit maps back onto the caller's own tuples
+        rest = stops[1:]
+        rank = {rest[i]: r for r, i in enumerate(order)}
+        self._routes[key] = tuple(-1 if stop == stops[0] else rank[stop] for stop in route)
+        self._routes.move_to_end(key)
+        if len(self._routes) > self.maxsize:
+            self._routes.popitem(last=False)
+
+    def optimize_route(self, stops: List[Tuple[float, float]], **kwargs) -> List[Tuple[float, float]]:
+        """
+        Return the optimized route for the stops, running the optimizer only on a miss.
+
+        Args:
+            stops: List of coordinates (x, y); the first one is the start of the route
+            **kwargs: Passed on to the optimizer, e.g. a precomputed distance_matrix;
+                they must be determined by the stops since they are not part of the key
+
+        Returns:
+            List of coordinates representing the optimized route
+        """
+        if len(stops) <= 2:
+            return self.optimizer.optimize_route(stops, **kwargs)
+
+        route = self.lookup(stops)
+        if route is None:
+            route = self.optimizer.optimize_route(stops, **kwargs)
+            self.store(stops, route)
+        return route
+
+    def clear(self):
+        """Forget every cached route."""
+        self._routes.clear()
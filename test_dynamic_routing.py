@@ -39,8 +39,13 @@ Note: The actual results may vary based on:
 """
 
 from dynamic_routing import DynamicRoutingSystem
+import os
 import time
-import random
+import numpy as np
+
+# Maps are only rendered when asked for, e.g. VISUALIZE=1 python test_dynamic_routing.py;
+# headless runs then time the routing logic alone
+VIS = os.environ.get("VISUALIZE") == "1"
 
 def generate_sample_deliveries(num_deliveries=5):
     """Generate sample delivery requests"""
@@ -59,15 +64,19 @@ def generate_sample_deliveries(num_deliveries=5):
         (23.2599, 77.4126)   # Bhopal
     ]
     
-    for i in range(num_deliveries):
-        pickup = random.choice(locations)
-        dropoff = random.choice([loc for loc in locations if loc != pickup])
-        weight = random.randint(500, 3000)  # Random weight between 500-3000 kg
+    # Draw distinct pickup and dropoff indices for all deliveries at once; a nonzero
+    # offset modulo the number of locations never lands on the pickup itself
+    rng = np.random.default_rng()
+    pickup_indices = rng.integers(0, len(locations), size=num_deliveries)
+    dropoff_indices = (pickup_indices + rng.integers(1, len(locations), size=num_deliveries)) % len(locations)
+    weights = rng.integers(500, 3000, size=num_deliveries, endpoint=True).tolist()  # Random weight between 500-3000 kg
+    
+    for i, (pickup_idx, dropoff_idx) in enumerate(zip(pickup_indices.tolist(), dropoff_indices.tolist())):
         deliveries.append({
             'id': f'D{i+1}',
-            'pickup': pickup,
-            'dropoff': dropoff,
-            'weight': weight
+            'pickup': locations[pickup_idx],
+            'dropoff': locations[dropoff_idx],
+            'weight': weights[i]
         })
     return deliveries
 
@@ -93,11 +102,12 @@ def simulate_truck_movement(routing_system, truck_id, duration_minutes=30):
         # Update truck location
         routing_system.update_truck_status(truck_id, next_location)
         
-        # Update visualization
-        routing_system.visualize_routes()
-        
         current_point = next_point
         time.sleep(1)  # Simulate 1 minute of movement
+    
+    # Render the map once for the whole movement instead of once per minute
+    if VIS and current_point > 0:
+        routing_system.visualize_routes()
 
 def main():
     # Initialize the routing system
@@ -130,7 +140,8 @@ def main():
         )
     
     print("Initial state:")
-    routing_system.visualize_routes()
+    if VIS:
+        routing_system.visualize_routes()
     
     # Assign deliveries to trucks
     print("\nAssigning deliveries...")
@@ -146,7 +157,10 @@ def main():
     for truck_id in routing_system.trucks:
         simulate_truck_movement(routing_system, truck_id, duration_minutes=5)
     
-    print("\nSimulation completed. Check dynamic_routes.html for visualization.")
+    if VIS:
+        print("\nSimulation completed. Check dynamic_routes.html for visualization.")
+    else:
+        print("\nSimulation completed. Set VISUALIZE=1 to render dynamic_routes.html.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,55 +1,66 @@
 from dynamic_routing import DynamicRoutingSystem
-import time
-import random
+import io
+import pandas as pd
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from datetime import datetime, timedelta
 
 """
 Test Scenarios for Dynamic Routing System
 
 This module contains comprehensive test scenarios for the dynamic routing system.
+Every scenario runs in its own process on a fresh system, so each one starts with
+the five empty trucks: T1 Delhi 5000kg, T2 Mumbai 3000kg, T3 Bangalore 4000kg,
+T4 Chennai 3500kg and T5 Kolkata 6000kg.
 Expected Test Results:
 
 1. High Priority Deliveries (Scenario 1):
-   - HP1 (Delhi to Mumbai, 1000kg): Should PASS
-   - HP2 (Bangalore to Chennai, 1500kg): Should PASS
-   - HP3 (Kolkata to Hyderabad, 2000kg): Should PASS
-   Reason: High priority deliveries should be prioritized for assignment
+   - HP1 (Delhi to Mumbai, 1000kg): Should PASS (assigned to T1)
+   - HP2 (Bangalore to Chennai, 1500kg): Should PASS (assigned to T3)
+   - HP3 (Kolkata to Hyderabad, 2000kg): Should PASS (assigned to T5)
+   Reason: Each pickup has an empty truck in the same city
 
 2. Capacity Management (Scenario 2):
-   - C1 (4500kg): Should FAIL (exceeds truck capacity)
-   - C2 (1000kg): Should PASS (within capacity)
-   - C3 (2000kg): Should PASS (medium delivery)
-   - C4 (3000kg): Should PASS (large delivery)
-   Reason: System should properly manage and enforce capacity constraints
+   - C1 (4500kg): Should PASS (only T1 and T5 can carry it; assigned to T1)
+   - C2 (1000kg): Should PASS (assigned to T3)
+   - C3 (2000kg): Should PASS (assigned to T5)
+   - C4 (3000kg): Should PASS (fills T2 exactly)
+   - C5 (7000kg): Should FAIL (heavier than every truck's capacity)
+   Reason: System should only match deliveries to trucks with enough capacity
 
 3. Multiple Deliveries (Scenario 3):
    - M1 (1000kg): Should PASS (assigned to T1)
    - M2 (1500kg): Should PASS (assigned to T2)
-   - M3 (1000kg): Should PASS (assigned to T4)
-   - M4 (2000kg): Should PASS (assigned to T5)
+   - M3 (1000kg): Should PASS (assigned to T3)
+   - M4 (2000kg): Should PASS (assigned to T4)
    Reason: System should handle multiple deliveries efficiently
 
 4. Emergency Rerouting (Scenario 4):
-   - E1 (2000kg): Should PASS (reassigned after T1 breakdown)
-   - E2 (1500kg): Should PASS (reassigned after T1 breakdown)
-   - E3 (1000kg): Should PASS (reassigned after T1 breakdown)
+   - E1 (2000kg): Should PASS (assigned to T1, reassigned to T4 after the T1 breakdown)
+   - E2 (1500kg): Should PASS (assigned to T2, unaffected by the breakdown)
+   - E3 (1000kg): Should PASS (assigned to T3, unaffected by the breakdown)
    Reason: System should handle truck breakdowns by reassigning deliveries
 
 5. Time Window Deliveries (Scenario 5):
-   - TW1 (2-hour window): Should PASS (immediate window)
-   - TW2 (2-hour window): Should PASS (1-hour delay)
-   - TW3 (2-hour window): Should PASS (2-hour delay)
+   - TW1 (2-hour window): Should PASS (immediate window; assigned to T1)
+   - TW2 (2-hour window): Should PASS (1-hour delay; assigned to T3)
+   - TW3 (2-hour window): Should PASS (2-hour delay; assigned to T5)
    Reason: System should respect time window constraints
 
 Note: The actual results may vary based on:
-- Current system state
 - Truck availability
 - Time of execution
 - System load
 """
 
 class TestScenarios:
+    # Time window offsets of scenario 5
+    _HOURS = {hours: timedelta(hours=hours) for hours in range(1, 5)}
+    
     def __init__(self):
+        # Map layer name -> route snapshot, rendered into one map by main()
+        self.layers = {}
         self.routing_system = DynamicRoutingSystem()
         self.routing_system.load_truck_data("GIS/Delivery truck trip data.xlsx")
         
@@ -77,6 +88,25 @@ class TestScenarios:
             (18.5204, 73.8567),  # Pune
             (23.2599, 77.4126)   # Bhopal
         ]
+        
+        # Every stop in these scenarios is a truck start or one of the locations,
+        # so their distances are computed once for all scenarios
+        self.routing_system.set_distance_table(
+            [location for _, _, location in self.trucks] + self.locations
+        )
+    
+    def _bulk_assign(self, deliveries, time_windows=None):
+        """
+        Add and assign (delivery_id, pickup, dropoff, weight) tuples in one bulk_assign call,
+        optionally with a (start, end) time window per delivery
+        """
+        frame = pd.DataFrame(
+            [(delivery_id, *pickup, *dropoff, weight) for delivery_id, pickup, dropoff, weight in deliveries],
+            columns=['id', 'pickup_lat', 'pickup_lon', 'drop_lat', 'drop_lon', 'weight']
+        )
+        if time_windows is not None:
+            frame['time_window'] = pd.Series(time_windows, index=frame.index, dtype=object)
+        return self.routing_system.bulk_assign(frame)
     
     def scenario_1_high_priority_deliveries(self):
         """Test high-priority delivery assignments"""
@@ -89,12 +119,12 @@ class TestScenarios:
             ("HP3", (22.5726, 88.3639), (17.3850, 78.4867), 2000, "urgent")   # Kolkata to Hyderabad
         ]
         
+        assigned = self._bulk_assign([delivery[:4] for delivery in high_priority_deliveries])
         for delivery_id, pickup, dropoff, weight, priority in high_priority_deliveries:
-            self.routing_system.add_delivery(delivery_id, pickup, dropoff, weight)
-            success = self.routing_system.assign_delivery(delivery_id)
+            success = assigned[delivery_id]
             print(f"High-priority delivery {delivery_id} assigned: {'Success' if success else 'Failed'}")
         
-        self.routing_system.visualize_routes()
+        self.layers["Scenario 1: High Priority Deliveries"] = self.routing_system.route_snapshot()
     
     def scenario_2_capacity_management(self):
         """Test capacity constraints and management"""
@@ -105,15 +135,16 @@ class TestScenarios:
             ("C1", (20.5937, 78.9629), (19.0760, 72.8777), 4500),  # Almost full truck
             ("C2", (12.9716, 77.5946), (13.0827, 80.2707), 1000),  # Small delivery
             ("C3", (22.5726, 88.3639), (17.3850, 78.4867), 2000),  # Medium delivery
-            ("C4", (19.2183, 72.9781), (18.5204, 73.8567), 3000)   # Large delivery
+            ("C4", (19.2183, 72.9781), (18.5204, 73.8567), 3000),  # Large delivery
+            ("C5", (28.6139, 77.2090), (23.2599, 77.4126), 7000)   # Exceeds every truck
         ]
         
+        assigned = self._bulk_assign(capacity_test_deliveries)
         for delivery_id, pickup, dropoff, weight in capacity_test_deliveries:
-            self.routing_system.add_delivery(delivery_id, pickup, dropoff, weight)
-            success = self.routing_system.assign_delivery(delivery_id)
+            success = assigned[delivery_id]
             print(f"Capacity test delivery {delivery_id} ({weight}kg) assigned: {'Success' if success else 'Failed'}")
         
-        self.routing_system.visualize_routes()
+        self.layers["Scenario 2: Capacity Management"] = self.routing_system.route_snapshot()
     
     def scenario_3_multiple_deliveries(self):
         """Test multiple deliveries per truck"""
@@ -127,12 +158,12 @@ class TestScenarios:
             ("M4", (13.0827, 80.2707), (22.5726, 88.3639), 2000)   # Chennai to Kolkata
         ]
         
+        assigned = self._bulk_assign(multiple_deliveries)
         for delivery_id, pickup, dropoff, weight in multiple_deliveries:
-            self.routing_system.add_delivery(delivery_id, pickup, dropoff, weight)
-            success = self.routing_system.assign_delivery(delivery_id)
+            success = assigned[delivery_id]
             print(f"Multiple delivery {delivery_id} assigned: {'Success' if success else 'Failed'}")
         
-        self.routing_system.visualize_routes()
+        self.layers["Scenario 3: Multiple Deliveries"] = self.routing_system.route_snapshot()
     
     def scenario_4_emergency_rerouting(self):
         """Test emergency rerouting when a truck breaks down"""
@@ -145,12 +176,10 @@ class TestScenarios:
             ("E3", (12.9716, 77.5946), (13.0827, 80.2707), 1000)
         ]
         
-        for delivery_id, pickup, dropoff, weight in initial_deliveries:
-            self.routing_system.add_delivery(delivery_id, pickup, dropoff, weight)
-            self.routing_system.assign_delivery(delivery_id)
+        self._bulk_assign(initial_deliveries)
         
         print("Initial assignments completed")
-        self.routing_system.visualize_routes()
+        self.layers["Scenario 4: before breakdown"] = self.routing_system.route_snapshot()
         
         # Simulate truck breakdown
         print("\nSimulating truck breakdown...")
@@ -159,55 +188,85 @@ class TestScenarios:
             failed_deliveries = self.routing_system.trucks["T1"]["deliveries"]
             del self.routing_system.trucks["T1"]
             
-            # Reassign failed deliveries
             for delivery_id in failed_deliveries:
-                success = self.routing_system.assign_delivery(delivery_id)
+                delivery = self.routing_system.deliveries[delivery_id]
+                candidates = self.routing_system.k_nearest_trucks(delivery['pickup'], k=3,
+                                                                  min_capacity=delivery['weight'])
+                print(f"Nearest trucks for {delivery_id}: "
+                      + (", ".join(f"{truck_id} ({distance:.0f} km)" for truck_id, distance in candidates) or "none"))
+            
+            # Reassign failed deliveries in one batch
+            self.routing_system.reassign_batch(failed_deliveries)
+            for delivery_id in failed_deliveries:
+                success = self.routing_system.deliveries[delivery_id]['status'] == 'in_progress'
                 print(f"Reassignment of {delivery_id}: {'Success' if success else 'Failed'}")
         
-        self.routing_system.visualize_routes()
+        self.layers["Scenario 4: after breakdown"] = self.routing_system.route_snapshot()
     
     def scenario_5_time_windows(self):
         """Test delivery assignments with time windows"""
         print("\n=== Scenario 5: Time Window Deliveries ===")
         
         # Add deliveries with time windows
+        # One clock reading, so every window is offset from the same moment
+        now = datetime.now()
         time_window_deliveries = [
             ("TW1", (20.5937, 78.9629), (19.0760, 72.8777), 1000, 
-             datetime.now(), datetime.now() + timedelta(hours=2)),
+             now, now + self._HOURS[2]),
             ("TW2", (12.9716, 77.5946), (13.0827, 80.2707), 1500,
-             datetime.now() + timedelta(hours=1), datetime.now() + timedelta(hours=3)),
+             now + self._HOURS[1], now + self._HOURS[3]),
             ("TW3", (22.5726, 88.3639), (17.3850, 78.4867), 2000,
-             datetime.now() + timedelta(hours=2), datetime.now() + timedelta(hours=4))
+             now + self._HOURS[2], now + self._HOURS[4])
         ]
         
+        assigned = self._bulk_assign([delivery[:4] for delivery in time_window_deliveries],
+                                     [delivery[4:] for delivery in time_window_deliveries])
         for delivery_id, pickup, dropoff, weight, start_time, end_time in time_window_deliveries:
-            self.routing_system.add_delivery(delivery_id, pickup, dropoff, weight)
-            success = self.routing_system.assign_delivery(delivery_id)
+            success = assigned[delivery_id]
             print(f"Time window delivery {delivery_id} assigned: {'Success' if success else 'Failed'}")
             print(f"Time window: {start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}")
         
-        self.routing_system.visualize_routes()
+        self.layers["Scenario 5: Time Windows"] = self.routing_system.route_snapshot()
 
-def main():
-    # Initialize test scenarios
-    test_scenarios = TestScenarios()
-    
-    # Run all scenarios
-    test_scenarios.scenario_1_high_priority_deliveries()
-    time.sleep(2)  # Wait between scenarios
-    
-    test_scenarios.scenario_2_capacity_management()
-    time.sleep(2)
-    
-    test_scenarios.scenario_3_multiple_deliveries()
-    time.sleep(2)
+SCENARIOS = [
+    "scenario_1_high_priority_deliveries",
+    "scenario_2_capacity_management",
+    "scenario_3_multiple_deliveries",
+    "scenario_4_emergency_rerouting",
+    "scenario_5_time_windows",
+]
+
+def run_scenario(number: int):
+    """
+    Worker entry point: run one scenario on its own routing system.
+    The system is rebuilt in the worker rather than pickled, and the scenario's
+    console output is returned so the scenarios print in order.
     
-    test_scenarios.scenario_4_emergency_rerouting()
-    time.sleep(2)
+    Returns:
+        Tuple of (console output, map layers of the scenario, hexagon counts)
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        test_scenarios = TestScenarios()
+        getattr(test_scenarios, SCENARIOS[number - 1])()
+    return output.getvalue(), test_scenarios.layers, test_scenarios.routing_system.hex_counts
+
+def main():
+    # Scenarios are independent, so each runs in its own process
+    layers = {}
+    hex_counts = None
+    with ProcessPoolExecutor(max_workers=min(len(SCENARIOS), os.cpu_count() or 1)) as executor:
+        for output, scenario_layers, hex_counts in executor.map(run_scenario, range(1, len(SCENARIOS) + 1)):
+            print(output, end="")
+            layers.update(scenario_layers)
     
-    test_scenarios.scenario_5_time_windows()
+    # Every scenario is a layer of one map, which is rendered and saved once. All
+    # scenarios load the same truck sheet, so any one of them has the hexagon counts
+    routing_system = DynamicRoutingSystem()
+    routing_system.hex_counts = hex_counts
+    routing_system.visualize_layers(layers, "dynamic_routes.html").result()
     
     print("\nAll test scenarios completed. Check dynamic_routes.html for visualizations.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -5,13 +5,11 @@ This script shows how to visualize routes optimized with the CIACO algorithm,
 including truck capacity constraints during pickup and delivery operations.
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from aco_visualization import ACOVisualization
-
 def load_sample_data():
     """Create a sample dataset of locations in Cairo"""
+    import numpy as np
+    import pandas as pd
+    
     # Example Cairo coordinates
     cairo_center = (30.0444, 31.2357)
     
@@ -34,6 +32,10 @@ def load_sample_data():
 
 def main():
     """Main function to run the visualization"""
+    # Imported here rather than at module level, so importing this script stays cheap
+    import matplotlib.pyplot as plt
+    from aco_visualization import ACOVisualization
+    
     print("Creating ACO visualization for Cairo delivery routes")
     
     # Load sample data
@@ -8,15 +8,13 @@ This script demonstrates the improved visualization with:
 4. Proper capacity constraints
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from improved_aco_visualization import ImprovedACOVisualization, generate_bangalore_data
-import folium
-from Order import Order
-
 def main():
     """Main function to run the Bangalore visualization"""
+    # Imported here rather than at module level, so importing this script stays cheap
+    import matplotlib.pyplot as plt
+    import folium
+    from improved_aco_visualization import ImprovedACOVisualization, generate_bangalore_data
+    
     print("Visualizing CIACO routes for Bangalore delivery operations")
     
     # Generate Bangalore sample data (or load from CSV if available)